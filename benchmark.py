@@ -0,0 +1,217 @@
+""" benchmark.py
+
+Search benchmark over fixed opening, midgame and endgame positions.
+
+Execution:
+    ```bash
+    $ python benchmark.py --depths 1 2 3 --output baseline.json
+    $ python benchmark.py --depths 1 2 3 --compare baseline.json
+    ```
+
+    Every (position, depth) case reports the nodes searched, nodes per
+second, wall time, peak traced memory and the best move. The results
+are written as JSON; with --compare, each case is also set against the
+same case of a saved result file.
+"""
+
+import argparse
+import json
+import sys
+import tracemalloc
+from time import perf_counter
+
+from const import *
+from core import Reversi
+from bitboard import BitboardReversi
+from reversi_AI_search import ReversiAI
+
+""" Test positions: 'X' is black, 'O' is white, '-' is empty. They
+were reached by random play from the initial position, so all of them
+are legal and none is finished.
+"""
+positions = {
+    'opening': (BoardState.Black, [
+        '--------',
+        '--------',
+        '-O-O----',
+        '-XXOX---',
+        '--XOX---',
+        '--OOXX--',
+        '--XO-O--',
+        '--------',
+    ]),
+    'early-midgame': (BoardState.Black, [
+        '-X--O---',
+        'X-XOOO--',
+        '-XOOO-O-',
+        '--XOXOX-',
+        '---XXXX-',
+        '---OXX--',
+        '----OO--',
+        '-----OO-',
+    ]),
+    'midgame': (BoardState.Black, [
+        '-----O--',
+        '-X--OO-X',
+        'OOXOOOOO',
+        '---XOXO-',
+        '-XXOXOO-',
+        '--XOOOO-',
+        '-O-OO-X-',
+        '---O---X',
+    ]),
+    'endgame': (BoardState.Black, [
+        '-OOO----',
+        'XXOOOXXX',
+        'XOXOOOOO',
+        'OOXOOOO-',
+        'OOOOXOO-',
+        '-OXX-X-O',
+        'OOOOXXX-',
+        'XXX-XX--',
+    ]),
+}
+
+piece_states = {
+    '-': BoardState.Empty,
+    'X': BoardState.Black,
+    'O': BoardState.White
+}
+
+
+def load_position(name, bitboard=Use_Bitboard):
+    """ Build a board engine holding one of the test positions.
+
+    Input:
+        name: String object, a key of positions.
+        bitboard: Bool object, whether to use BitboardReversi.
+    Output:
+        Reversi or BitboardReversi object.
+    """
+    (current_state, rows) = positions[name]
+    chessMap = [[piece_states[piece] for piece in row] for row in rows]
+    if bitboard:
+        return BitboardReversi(chessMap, current_state)
+    return Reversi(chessMap, current_state)
+
+
+def run_case(name, depth, bitboard=Use_Bitboard, memory=True,
+             algorithm=AI_Search_Algorithm):
+    """ Search one position to one depth with a fresh ReversiAI.
+
+    The timed search runs untraced; the peak memory comes from a
+    second, identical search under tracemalloc.
+
+    Output:
+        Dict object with the measurements of the case.
+    """
+    reversi = load_position(name, bitboard)
+    ai = ReversiAI(reversi, depth, workers=1, verbose=False,
+                   algorithm=algorithm)
+    start = perf_counter()
+    (best_row, best_col) = ai.think()
+    elapsed = perf_counter() - start
+    nodes = ai.get_node_count()
+
+    peak = None
+    if memory:
+        ai = ReversiAI(reversi, depth, workers=1, verbose=False,
+                       algorithm=algorithm)
+        tracemalloc.start()
+        ai.think()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'position': name,
+        'depth': depth,
+        'nodes': nodes,
+        'nodes_per_second': round(nodes / elapsed, 1) if elapsed else None,
+        'time': round(elapsed, 6),
+        'peak_memory': peak,
+        'best_move': [best_row, best_col]
+    }
+
+
+def run_suite(depths, names=None, bitboard=Use_Bitboard, memory=True,
+              algorithm=AI_Search_Algorithm):
+    """ Run every (position, depth) case.
+
+    Output:
+        Dict object with the engine and algorithm names and the list
+    of cases.
+    """
+    if names is None:
+        names = list(positions)
+    cases = [run_case(name, depth, bitboard, memory, algorithm)
+             for name in names for depth in depths]
+    return {
+        'engine': 'bitboard' if bitboard else 'list',
+        'algorithm': algorithm,
+        'cases': cases
+    }
+
+
+def compare(result, baseline):
+    """ Set every case against the same case of a baseline.
+
+    Output:
+        List object of dicts with the speedup in time and nodes per
+    second, the change in nodes and whether the best move changed.
+    """
+    saved = {(case['position'], case['depth']): case
+             for case in baseline['cases']}
+    rows = []
+    for case in result['cases']:
+        old = saved.get((case['position'], case['depth']))
+        if old is None:
+            continue
+        rows.append({
+            'position': case['position'],
+            'depth': case['depth'],
+            'speedup': round(old['time'] / case['time'], 3)
+            if case['time'] else None,
+            'nps_ratio': round(case['nodes_per_second'] /
+                               old['nodes_per_second'], 3)
+            if old['nodes_per_second'] else None,
+            'node_ratio': round(case['nodes'] / old['nodes'], 3)
+            if old['nodes'] else None,
+            'same_best_move': case['best_move'] == old['best_move']
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark ReversiAI on fixed positions.')
+    parser.add_argument('--depths', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--positions', nargs='+', choices=list(positions),
+                        default=None)
+    parser.add_argument('--engine', choices=['bitboard', 'list'],
+                        default='bitboard' if Use_Bitboard else 'list')
+    parser.add_argument('--algorithm', choices=list(ReversiAI.algorithms),
+                        default=AI_Search_Algorithm)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc pass')
+    parser.add_argument('-o', '--output', default=None,
+                        help='write the results to this JSON file')
+    parser.add_argument('--compare', default=None,
+                        help='baseline JSON file written by --output')
+    args = parser.parse_args(argv)
+
+    result = run_suite(args.depths, args.positions,
+                       args.engine == 'bitboard', not args.no_memory,
+                       args.algorithm)
+    if args.compare is not None:
+        with open(args.compare) as baseline:
+            result['comparison'] = compare(result, json.load(baseline))
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(result, output, indent=2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
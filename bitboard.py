@@ -0,0 +1,590 @@
+""" bitboard.py
+
+Contains the BitboardReversi class, a 64-bit bitboard implementation
+of the Reversi core.
+"""
+
+from const import *
+from core import symmetric_piece, symmetric_flip, symmetric_white_turn, \
+    hash_mask, canonical_hash, canonical_bits
+
+__all__ = ['BitboardReversi', 'move_mask', 'flip_mask', 'popcount',
+           'full_mask']
+
+if n != 8:
+    raise Exception('Bitboard engine requires an 8x8 board')
+
+""" Square (row, col) is mapped to the bit row * n + col. """
+
+full_mask = (1 << n_squared) - 1
+not_first_col = full_mask
+not_last_col = full_mask
+for row in range(n):
+    not_first_col &= ~(1 << (row * n))
+    not_last_col &= ~(1 << (row * n + n - 1))
+
+""" Shift amount and wrap-around mask of each direction, in the same
+order as core.pos_shift. A shift towards a larger column must not land
+in the first column, and vice versa.
+"""
+bit_shift = [(-8, full_mask), (-7, not_first_col), (1, not_first_col),
+             (9, not_first_col), (8, full_mask), (7, not_last_col),
+             (-1, not_last_col), (-9, not_last_col)]
+
+""" weight_matrix flattened by square, and the bitboard of the squares
+sharing each weight, so a weighted sum takes one popcount per weight.
+"""
+square_weight = [weight_matrix[square // n][square % n]
+                 for square in range(n_squared)]
+weight_masks = {}
+for square in range(n_squared):
+    weight_masks[square_weight[square]] = \
+        weight_masks.get(square_weight[square], 0) | (1 << square)
+weight_masks = sorted(weight_masks.items())
+
+
+def shift(bits, amount, mask):
+    """Shift the bitboard in one direction, dropping wrapped bits."""
+    if amount > 0:
+        return (bits << amount) & mask
+    return (bits >> -amount) & mask
+
+
+def popcount(bits):
+    """Count the set bits of a bitboard."""
+    return bin(bits).count('1')
+
+
+def weight_sum(bits):
+    """Sum weight_matrix over the set bits of a bitboard."""
+    total = 0
+    for (weight, mask) in weight_masks:
+        total += weight * popcount(bits & mask)
+    return total
+
+
+def move_mask(own, oppo):
+    """Generate all legal moves for the player owning `own`.
+
+    Output:
+        Int object, a bitboard of the legal move positions.
+    """
+    empty = ~(own | oppo) & full_mask
+    moves = 0
+    for (amount, mask) in bit_shift:
+        run = shift(own, amount, mask) & oppo
+        run |= shift(run, amount, mask) & oppo
+        run |= shift(run, amount, mask) & oppo
+        run |= shift(run, amount, mask) & oppo
+        run |= shift(run, amount, mask) & oppo
+        run |= shift(run, amount, mask) & oppo
+        moves |= shift(run, amount, mask) & empty
+    return moves
+
+
+def flip_mask(square, own, oppo):
+    """Compute the pieces flipped by placing a piece on `square`.
+
+    Input:
+        square: Int object, the single-bit bitboard of the move.
+        own, oppo: Bitboards of the moving player and the opponent.
+    Output:
+        Int object, a bitboard of the flipped pieces.
+    """
+    flips = 0
+    for (amount, mask) in bit_shift:
+        run = 0
+        cursor = shift(square, amount, mask)
+        while cursor & oppo:
+            run |= cursor
+            cursor = shift(cursor, amount, mask)
+        if cursor & own:
+            flips |= run
+    return flips
+
+
+class BitboardReversi(object):
+    """Reversi object backed by two 64-bit bitboards.
+
+    Exposes the same interface as core.Reversi, so it can be handed
+    to ReversiAI and ReversiInterface unchanged.
+
+    Attributes:
+        __black: int. bitboard of the black pieces.
+        __white: int. bitboard of the white pieces.
+        __currentState: BoardState object. the current active player.
+        __history: List object. the undo records of the moves made,
+    each kept with the legal move cache of the position before it.
+        __legal_moves: List object. the cached legal moves of the
+    current player, None until computed for the current position.
+        __legal_flips: Dict object. the cached flipped bits keyed by
+    the move bit.
+        __move_masks: Dict object. the cached legal move bitboard of
+    each color, filled by move() for the player to move next.
+        __availability_map: 2-D List. the cached
+    get_availability_map() result.
+        __hash: int. the packed symmetric Zobrist hash of the pieces,
+    excluding the side to move.
+        __weight: int. weight_matrix summed over the black pieces minus
+    the white pieces.
+    """
+    __slots__ = ('__black', '__white', '__currentState', '__history',
+                 '__legal_moves', '__legal_flips', '__move_masks',
+                 '__availability_map', '__hash', '__weight')
+
+    def __init__(
+            self,
+            chessMap=None,
+            currentState=None,
+            BlackCount=-1,
+            WhiteCount=-1
+    ):
+        """BlackCount and WhiteCount are accepted for compatibility
+        with core.Reversi; the counts are always derived from the
+        bitboards.
+        """
+        self.__history = []
+        self.__clear_cache()
+        if chessMap is None:
+            self.__black = (1 << (3 * n + 4)) | (1 << (4 * n + 3))
+            self.__white = (1 << (3 * n + 3)) | (1 << (4 * n + 4))
+            self.__currentState = BoardState.Black
+        else:
+            self.__set_board_state(chessMap, currentState)
+        self.__hash = self.__compute_hash()
+        self.__weight = weight_sum(self.__black) - weight_sum(self.__white)
+
+    def copy(self):
+        """ Copy the position, without the move history.
+
+        Output:
+            BitboardReversi object.
+        """
+        other = BitboardReversi.__new__(BitboardReversi)
+        other.__black = self.__black
+        other.__white = self.__white
+        other.__currentState = self.__currentState
+        other.__history = []
+        other.__legal_moves = self.__legal_moves
+        other.__legal_flips = self.__legal_flips
+        other.__move_masks = dict(self.__move_masks)
+        other.__availability_map = self.__availability_map
+        other.__hash = self.__hash
+        other.__weight = self.__weight
+        return other
+
+    def __set_board_state(self, chessMap, currentState):
+        """Set the bitboards from a 2-D chessMap."""
+        if len(chessMap) != n or len(chessMap[0]) != n:
+            raise Exception('Board dimension mismatch: expected',
+                            '(' + str(n) + ',' + str(n) + ')')
+        black = 0
+        white = 0
+        for row in range(n):
+            for col in range(n):
+                if chessMap[row][col] == BoardState.Black:
+                    black |= 1 << (row * n + col)
+                elif chessMap[row][col] == BoardState.White:
+                    white |= 1 << (row * n + col)
+
+        self.__black = black
+        self.__white = white
+        self.__currentState = currentState
+        self.__clear_cache()
+
+    def __compute_hash(self):
+        """Compute the Zobrist hash of the pieces from scratch."""
+        key = 0
+        for square in range(n_squared):
+            if (self.__black >> square) & 1:
+                key ^= symmetric_piece[square][BoardState.Black.value]
+            elif (self.__white >> square) & 1:
+                key ^= symmetric_piece[square][BoardState.White.value]
+        return key
+
+    def __hash_flips(self, flips):
+        """Toggle the Zobrist keys of the flipped pieces."""
+        while flips:
+            bit = flips & -flips
+            self.__hash ^= symmetric_flip[bit.bit_length() - 1]
+            flips ^= bit
+
+    def get_weight_score(self):
+        """ Get weight_matrix summed over the black pieces minus the
+        white pieces, which is updated incrementally by every move.
+
+        Output:
+            Int object.
+        """
+        return self.__weight
+
+    def __add_weight(self, self_state, placed, square, flips):
+        """Shift the weighted piece difference after placing
+        (placed = 1) or removing (placed = -1) a piece of self_state
+        on square which flipped the given bits.
+        """
+        delta = square_weight[square] + 2 * weight_sum(flips)
+        if self_state == BoardState.Black:
+            self.__weight += placed * delta
+        else:
+            self.__weight -= placed * delta
+
+    def get_bitboards(self):
+        """ Get the position as bitboards.
+
+        Output:
+            Tuple object (black bits, white bits).
+        """
+        return (self.__black, self.__white)
+
+    def get_hash(self):
+        """ Get the Zobrist hash of the position, which is updated
+        incrementally by every move.
+
+        Output:
+            Int object, a 64-bit key including the side to move.
+        """
+        return self.__side_hash() & hash_mask
+
+    def get_canonical_hash(self):
+        """ Get the Zobrist hash of the canonical form of the position,
+        the same for all 8 symmetric images of it.
+
+        Output:
+            Tuple object (key, sym): the 64-bit key, and the symmetry
+        that maps the board onto its canonical form.
+        """
+        return canonical_hash(self.__side_hash())
+
+    def get_canonical(self):
+        """ Get the canonical form of the position: the smallest of its
+        8 symmetric images.
+
+        Output:
+            Tuple object (own, oppo, sym): the bitboards of the player
+        to move and the opponent, and the symmetry producing them.
+        """
+        (black, white) = self.get_bitboards()
+        if self.__currentState == BoardState.Black:
+            return canonical_bits(black, white)
+        return canonical_bits(white, black)
+
+    def __side_hash(self):
+        """Packed symmetric hash including the side to move."""
+        if self.__currentState == BoardState.White:
+            return self.__hash ^ symmetric_white_turn
+        return self.__hash
+
+    def __clear_cache(self):
+        """Drop the cached legal moves after the position changed."""
+        self.__legal_moves = None
+        self.__legal_flips = None
+        self.__move_masks = {}
+        self.__availability_map = None
+
+    def __move_mask_of(self, self_state):
+        """Returns the cached legal move bitboard of self_state."""
+        moves = self.__move_masks.get(self_state)
+        if moves is None:
+            (own, oppo) = self.__own_oppo(self_state)
+            moves = move_mask(own, oppo)
+            self.__move_masks[self_state] = moves
+        return moves
+
+    def __own_oppo(self, self_state):
+        """Returns the bitboards ordered as (self_state, opponent)."""
+        if self_state == BoardState.Black:
+            return (self.__black, self.__white)
+        elif self_state == BoardState.White:
+            return (self.__white, self.__black)
+        raise ValueError('Unknown Board State')
+
+    def __set_own_oppo(self, self_state, own, oppo):
+        """Store the bitboards given as (self_state, opponent)."""
+        if self_state == BoardState.Black:
+            (self.__black, self.__white) = (own, oppo)
+        else:
+            (self.__white, self.__black) = (own, oppo)
+
+    def get_chessMap(self):
+        """ Get the current 2-D board, built from the bitboards.
+
+        Output:
+            List object, represents the chess map in 2-D
+        List.
+        """
+        return [[self.get_position_state(row, col) for col in range(n)]
+                for row in range(n)]
+
+    def get_position_state(self, row, col):
+        """ Get the state in a a specific.
+
+        Output:
+            BoardState object, represents the state in a
+        specific position.
+        """
+        bit = 1 << (row * n + col)
+        if self.__black & bit:
+            return BoardState.Black
+        elif self.__white & bit:
+            return BoardState.White
+        return BoardState.Empty
+
+    def get_chess_count(self):
+        """ Get the total number of chesses in black and white.
+
+        Output:
+            List object with 2 elements.
+        """
+        return (popcount(self.__black), popcount(self.__white))
+
+    def get_tot_chess_count(self):
+        """ Get the total number of all chesses.
+
+        Output:
+            Int object.
+        """
+        return popcount(self.__black | self.__white)
+
+    def get_current_state(self):
+        """ Get the current game player.
+
+        Output:
+            BoardState object.
+        """
+        return self.__currentState
+
+    def get_reverse_state(self, chess):
+        """ Get the reverse state of a certain state.
+        Input:
+            chess: BoardState object.
+        Output:
+            BoardState object.
+        """
+        if chess == BoardState.Black:
+            return BoardState.White
+        elif chess == BoardState.White:
+            return BoardState.Black
+        else:
+            raise Exception('State is empty')
+
+    def get_opponent_state(self):
+        """ Get the player state that are not in action.
+
+        Output:
+            BoardState object.
+        """
+        return self.get_reverse_state(self.__currentState)
+
+    def swap_state(self):
+        """Move the currentState to the other player."""
+        self.__currentState = self.get_opponent_state()
+        self.__clear_cache()
+
+    def position_test(self, pos_row, pos_col):
+        """Check whether (pow_row, pos_col) is a valid position.
+
+        Output:
+            Bool object.
+        """
+        return pos_row >= 0 and \
+               pos_row < n and \
+               pos_col >= 0 and \
+               pos_col < n
+
+    def validity_test(self, pos_row, pos_col, self_state, oppo_state):
+        """Test if the current State is valid.
+
+        Output:
+            Tuple object consists of success bool indicators and error
+        message.
+        """
+        if not self.position_test(pos_row, pos_col):
+            if pos_row < 0 or pos_row >= n:
+                return (False, 'Row index out of range')
+            if pos_col < 0 or pos_col >= n:
+                return (False, 'Column index out of range')
+
+        bit = 1 << (pos_row * n + pos_col)
+        if (self.__black | self.__white) & bit:
+            return (False, 'Designated position is not empty')
+
+        (own, oppo) = self.__own_oppo(self_state)
+        if flip_mask(bit, own, oppo):
+            return (True, '')
+        else:
+            return (False, 'Invalid move')
+
+    def __next(self):
+        """Switch the current State of player. The move generation of
+        the opponent is kept as the legal move cache of the next turn.
+        """
+        if self.__move_mask_of(self.get_opponent_state()):
+            self.__currentState = self.get_opponent_state()
+        return
+
+    def move(self, pos_row, pos_col, safety_check=True):
+        """Make a move on the board.
+
+        Input:
+            pos_row, pos_col: Position of the possible move position.
+            safety_check: Bool object, indicate whether it is
+        necessary to perform check beforehand.
+        Output:
+            Tuple object, the undo record (pos_row, pos_col, flipped
+        bits, moving state) of the move, the same as in core.Reversi.
+        self.undo_move() takes the move back.
+        """
+        self_state = self.__currentState
+
+        if safety_check:
+            if type(pos_row) != int or type(pos_col) != int:
+                raise ValueError('Position data must be int')
+            self.legal_moves()
+            if not self.position_test(pos_row, pos_col) or \
+                    (1 << (pos_row * n + pos_col)) not in self.__legal_flips:
+                (valid, error_description) = self.validity_test(
+                    pos_row, pos_col, self_state, self.get_opponent_state())
+                raise Exception(error_description)
+
+        bit = 1 << (pos_row * n + pos_col)
+        (own, oppo) = self.__own_oppo(self_state)
+
+        """ Reuse the flips found by legal_moves() when available. """
+        flips = None
+        if self.__legal_flips is not None:
+            flips = self.__legal_flips.get(bit)
+        if flips is None:
+            flips = flip_mask(bit, own, oppo)
+        self.__set_own_oppo(self_state, own | bit | flips, oppo & ~flips)
+        self.__hash ^= symmetric_piece[pos_row * n + pos_col][
+            self_state.value]
+        self.__hash_flips(flips)
+        self.__add_weight(self_state, 1, pos_row * n + pos_col, flips)
+
+        record = (pos_row, pos_col, flips, self_state)
+        self.__history.append((record, self.__legal_moves,
+                               self.__legal_flips, self.__move_masks))
+        self.__clear_cache()
+
+        self.__next()
+        return record
+
+    def undo_move(self):
+        """Take back the last move made with self.move().
+
+        Output:
+            Tuple object, the undo record of the move taken back.
+        """
+        if not self.__history:
+            raise Exception('No move to undo')
+
+        (record, legal_moves, legal_flips, move_masks) = \
+            self.__history.pop()
+        (pos_row, pos_col, flips, self_state) = record
+        square = pos_row * n + pos_col
+        bit = 1 << square
+        (own, oppo) = self.__own_oppo(self_state)
+        self.__set_own_oppo(self_state, own & ~(bit | flips), oppo | flips)
+        self.__hash ^= symmetric_piece[square][self_state.value]
+        self.__hash_flips(flips)
+        self.__add_weight(self_state, -1, square, flips)
+        self.__currentState = self_state
+        self.__legal_moves = legal_moves
+        self.__legal_flips = legal_flips
+        self.__move_masks = move_masks
+        self.__availability_map = None
+
+        return record
+
+    def legal_moves(self):
+        """Generate the legal moves of the current player together
+        with the pieces each of them flips.
+
+        The result is computed once per position and cached until
+        the next move, so it must not be modified by the caller.
+
+        Output:
+            List object of (pos_row, pos_col, flipped bits) tuples, in
+        row-major order. Bit row * n + col of flipped bits is set for
+        every piece the move flips, the same as in core.Reversi.
+        """
+        if self.__legal_moves is None:
+            (own, oppo) = self.__own_oppo(self.__currentState)
+            remaining = self.__move_mask_of(self.__currentState)
+            moves = []
+            flips = {}
+            while remaining:
+                bit = remaining & -remaining
+                square = bit.bit_length() - 1
+                flips[bit] = flip_mask(bit, own, oppo)
+                moves.append((square // n, square % n, flips[bit]))
+                remaining ^= bit
+
+            self.__legal_moves = moves
+            self.__legal_flips = flips
+        return self.__legal_moves
+
+    #----------Status Check----------#
+    def check_availability(self, self_state=None):
+        """Output if there is any available position for current
+        player on the board.
+
+        Input:
+            self_state: BoardState objects indicating the color of
+        piece for state checking. Default value is set to
+        self.__currentState.
+        Output:
+            Bool object.
+        """
+        if self_state is None:
+            self_state = self.__currentState
+
+        return self.__move_mask_of(self_state) != 0
+
+    def check_winning_status(self):
+        """Check the winner status.
+
+        Output:
+            Tuple object, consists of Bool indicator and the winnger in
+        BoardState object.
+        """
+        Finished = False
+        Winner = None
+
+        if (self.__black | self.__white) == full_mask:
+            Finished = True
+        elif not self.check_availability() and \
+                not self.check_availability(self.get_opponent_state()):
+            Finished = True
+
+        if Finished:
+            (black_count, white_count) = self.get_chess_count()
+            if black_count > white_count:
+                Winner = BoardState.Black
+            elif black_count < white_count:
+                Winner = BoardState.White
+            else:
+                Winner = BoardState.Empty
+
+        return (Finished, Winner)
+
+    def get_availability_map(self):
+        """Returns the possible position for the current move.
+
+        Cooperates with ReversiInterface.draw_availability_map(). The
+        map is cached until the next move, so it must not be modified
+        by the caller.
+
+        Output:
+            2D List with available positions.
+        """
+        if self.__availability_map is None:
+            self_state = self.__currentState
+            ava_map = [[BoardState.Empty for j in range(n)]
+                       for i in range(n)]
+            for (row, col, flips) in self.legal_moves():
+                ava_map[row][col] = self_state
+            self.__availability_map = ava_map
+
+        return self.__availability_map
@@ -18,7 +18,67 @@ n = 8
 n_squared = n ** 2
 
 AI_Search_Depth = 2
+
+""" Time budget in seconds for each AI move. When set, the AI deepens
+iteratively until the budget runs out instead of stopping at
+AI_Search_Depth.
+"""
+AI_Time_Limit = None
+
+""" Number of empty squares from which the AI solves the game exactly
+instead of searching to AI_Search_Depth.
+"""
+AI_Endgame_Empties = 10
+
+""" The opening book file, used by the AI when it exists. Built by
+opening_book.py.
+"""
+Opening_Book_Path = os.path.join(dirname, 'book.bin')
+
+""" Number of processes searching the AI root moves in parallel. """
+AI_Workers = 1
+
+""" Whether the AI searches the replies of the human player while the
+human is thinking, so that its answers are ready when they move.
+"""
+AI_Ponder = True
+
+""" Number of slots of the AI transposition table, a power of 2. """
+AI_TT_Size = 1 << 18
+
+""" Search algorithm of the AI: 'alphabeta' searches every move with
+the full window, 'pvs' (principal variation search) proves the moves
+after the first with null windows and deepens with aspiration windows
+of AI_Aspiration_Window around the previous score. On the benchmark
+positions 'pvs' searches fewer nodes at depths 4 and 6 only, so the
+game, at AI_Search_Depth, keeps 'alphabeta'.
+"""
+AI_Search_Algorithm = 'alphabeta'
+AI_Aspiration_Window = 16
+
+""" Selects the board engine: BitboardReversi when True, the 2-D list
+based Reversi otherwise.
+"""
+Use_Bitboard = True
+
 inf = int(1e8)
 winning = int(1e4)
 
 playerlist = [PlayerState.Human, PlayerState.AI]
+
+"""
+The weight matrix is set according to position importance. The
+point on the edge are more crucial to take compared to the point
+in the middle, and the four positions on the corner are even more
+substantial: The pieces placed at the corner couldn't be flipped,
+and the pieces placed on the edge could only be flipped with other
+pieces on the same edge.
+"""
+weight_matrix = [[16, 4, 4, 4, 4, 4, 4, 16],
+                 [4, 1, 1, 1, 1, 1, 1, 4],
+                 [4, 1, 1, 1, 1, 1, 1, 4],
+                 [4, 1, 1, 1, 1, 1, 1, 4],
+                 [4, 1, 1, 1, 1, 1, 1, 4],
+                 [4, 1, 1, 1, 1, 1, 1, 4],
+                 [4, 1, 1, 1, 1, 1, 1, 4],
+                 [16, 4, 4, 4, 4, 4, 4, 16]]
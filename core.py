@@ -3,10 +3,12 @@
 Contains the Reversi core class.
 """
 
-from enum import Enum
-from copy import deepcopy
+from random import Random
 from const import *
 
+__all__ = ['Reversi', 'transform_bits', 'transform_move', 'canonical_bits',
+           'canonical_hash']
+
 pos_shift = [(-1, 0), (-1, 1), (0, 1), (1, 1),
              (1, 0), (1, -1), (0, -1), (-1, -1)]
 initial_map = [[BoardState.Empty for j in range(n)] for i in range(n)]
@@ -17,16 +19,189 @@ for row in range(n // 2 - 1, n // 2 + 1):
         else:
             initial_map[row][col] = BoardState.Black
 
+""" BoardState objects by their value, to read the byte board. """
+board_states = (BoardState.Empty, BoardState.Black, BoardState.White)
+
+""" Ray tables. square_rays[square] holds, for every direction of
+pos_shift, the tuple of squares from the neighbour of square to the
+edge of the board. Rays shorter than 2 squares can never flip a piece
+and are left out. square_positions[square] is (row, col).
+"""
+square_positions = [(square // n, square % n) for square in range(n_squared)]
+square_rays = []
+for (start_row, start_col) in square_positions:
+    rays = []
+    for (xshift, yshift) in pos_shift:
+        ray = []
+        (row, col) = (start_row + xshift, start_col + yshift)
+        while 0 <= row < n and 0 <= col < n:
+            ray.append(row * n + col)
+            (row, col) = (row + xshift, col + yshift)
+        if len(ray) >= 2:
+            rays.append(tuple(ray))
+    square_rays.append(tuple(rays))
+
+""" The 8 symmetries of the board: identity, the three rotations, and
+the four reflections. symmetry_squares[sym][square] is the square
+that `square` is moved to by symmetry sym, and inverse_symmetry[sym]
+undoes sym.
+"""
+symmetry_maps = [
+    lambda row, col: (row, col),
+    lambda row, col: (col, n - 1 - row),
+    lambda row, col: (n - 1 - row, n - 1 - col),
+    lambda row, col: (n - 1 - col, row),
+    lambda row, col: (row, n - 1 - col),
+    lambda row, col: (n - 1 - row, col),
+    lambda row, col: (col, row),
+    lambda row, col: (n - 1 - col, n - 1 - row)
+]
+symmetry_squares = []
+for symmetry in symmetry_maps:
+    squares = []
+    for square in range(n_squared):
+        (new_row, new_col) = symmetry(square // n, square % n)
+        squares.append(new_row * n + new_col)
+    symmetry_squares.append(squares)
+inverse_symmetry = []
+for squares in symmetry_squares:
+    for other in range(len(symmetry_squares)):
+        if all(symmetry_squares[other][squares[square]] == square
+               for square in range(n_squared)):
+            inverse_symmetry.append(other)
+            break
+
+""" symmetry_rows[sym][row][value] is the image under symmetry sym of
+the bitboard whose row `row` holds the bits `value`, so a whole board
+is transformed with one lookup per row.
+"""
+row_mask = (1 << n) - 1
+symmetry_rows = []
+for squares in symmetry_squares:
+    rows = []
+    for row in range(n):
+        table = [0] * (1 << n)
+        for value in range(1, 1 << n):
+            low = value & -value
+            table[value] = table[value ^ low] | \
+                (1 << squares[row * n + low.bit_length() - 1])
+        rows.append(table)
+    symmetry_rows.append(rows)
+
+
+def transform_bits(bits, sym):
+    """Apply symmetry sym to a bitboard."""
+    result = 0
+    row = 0
+    for table in symmetry_rows[sym]:
+        result |= table[(bits >> row) & row_mask]
+        row += n
+    return result
+
+
+def transform_move(move, sym):
+    """Apply symmetry sym to a (row, col) position."""
+    square = symmetry_squares[sym][move[0] * n + move[1]]
+    return (square // n, square % n)
+
+
+def canonical_bits(own, oppo):
+    """Reduce a position over the 8 symmetries.
+
+    Input:
+        own, oppo: Bitboards of the player to move and the opponent.
+    Output:
+        Tuple object (own, oppo, sym): the smallest transformed
+    (own, oppo) pair and the symmetry producing it.
+    """
+    best = None
+    for sym in range(len(symmetry_squares)):
+        candidate = (transform_bits(own, sym), transform_bits(oppo, sym),
+                     sym)
+        if best is None or candidate < best:
+            best = candidate
+    return best
+
+
+""" Zobrist keys. zobrist_piece[square][state.value] is the key of a
+piece on square = row * n + col. The keys are drawn from a fixed seed,
+so every process hashes a position to the same value.
+
+The boards hash all 8 symmetric images of a position at once: in its
+64-bit slot sym, symmetric_piece[square][state.value] packs the key of
+the square that symmetry sym moves `square` to. Slot 0 is the hash of
+the position itself, and the smallest slot is its canonical hash.
+"""
+zobrist_random = Random(152)
+zobrist_piece = [[0, zobrist_random.getrandbits(64),
+                  zobrist_random.getrandbits(64)]
+                 for square in range(n_squared)]
+zobrist_white_turn = zobrist_random.getrandbits(64)
+
+hash_bits = 64
+hash_mask = (1 << hash_bits) - 1
+symmetric_piece = []
+for square in range(n_squared):
+    keys = [0, 0, 0]
+    for sym in range(len(symmetry_squares)):
+        for value in range(len(keys)):
+            keys[value] |= zobrist_piece[symmetry_squares[sym][square]][
+                value] << (sym * hash_bits)
+    symmetric_piece.append(keys)
+symmetric_flip = [keys[1] ^ keys[2] for keys in symmetric_piece]
+symmetric_white_turn = 0
+for sym in range(len(symmetry_squares)):
+    symmetric_white_turn |= zobrist_white_turn << (sym * hash_bits)
+
+
+def canonical_hash(packed):
+    """Pick the canonical hash out of a packed symmetric hash.
+
+    Output:
+        Tuple object (key, sym): the smallest of the 8 hashes and the
+    symmetry producing it.
+    """
+    best = packed & hash_mask
+    best_sym = 0
+    for sym in range(1, len(symmetry_squares)):
+        key = (packed >> (sym * hash_bits)) & hash_mask
+        if key < best:
+            best = key
+            best_sym = sym
+    return (best, best_sym)
+
 
 class Reversi(object):
     """Reversi object that manages the entire game status.
 
+    The board is a bytearray holding the BoardState value of every
+    square = row * n + col, and the object has __slots__, so a position
+    is small and copy() is a few C-level copies.
+
     Attributes:
-        __chessMap: 2-D List. the board status.
+        __board: bytearray. the board status.
+        __chessMap: 2-D List. the get_chessMap() view of __board, None
+    until built for the current position.
         __currentState: BoardState object`. the current active player.
         __BlackCount: int. the total number of black pieces.
         __WhiteCount: int. the total number of white pieces.
+        __history: List object. the undo records of the moves made,
+    each kept with its flipped positions and the legal move cache of
+    the position before it.
+        __legal: Dict object. the cached legal moves of each color, as
+    a (move list, (flipped positions, flipped bits) keyed by move
+    position) pair. move() fills it for the player to move next.
+        __availability_map: 2-D List. the cached
+    get_availability_map() result.
+        __hash: int. the packed symmetric Zobrist hash of the pieces,
+    excluding the side to move.
+        __weight: int. weight_matrix summed over the black pieces minus
+    the white pieces.
     """
+    __slots__ = ('__board', '__chessMap', '__currentState', '__BlackCount',
+                 '__WhiteCount', '__history', '__legal',
+                 '__availability_map', '__hash', '__weight')
+
     def __init__(
             self,
             chessMap=None,
@@ -34,27 +209,54 @@ class Reversi(object):
             BlackCount=-1,
             WhiteCount=-1
     ):
+        self.__history = []
+        self.__clear_cache()
         if chessMap is None:
-            self.__chessMap = deepcopy(initial_map)
-            self.__currentState = BoardState.Black
-            self.__BlackCount = 2
-            self.__WhiteCount = 2
-        else:
-            self.__set_board_state(
-                chessMap,
-                currentState,
-                BlackCount,
-                WhiteCount
-            )
+            chessMap = initial_map
+            currentState = BoardState.Black
+        self.__set_board_state(
+            chessMap,
+            currentState,
+            BlackCount,
+            WhiteCount
+        )
+        self.__hash = self.__compute_hash()
+        self.__weight = self.__compute_weight()
+
+    def copy(self):
+        """ Copy the position, without the move history.
+
+        Output:
+            Reversi object.
+        """
+        other = Reversi.__new__(Reversi)
+        other.__board = self.__board[:]
+        other.__chessMap = None
+        other.__currentState = self.__currentState
+        other.__BlackCount = self.__BlackCount
+        other.__WhiteCount = self.__WhiteCount
+        other.__history = []
+        other.__legal = dict(self.__legal)
+        other.__availability_map = self.__availability_map
+        other.__hash = self.__hash
+        other.__weight = self.__weight
+        return other
 
     def get_chessMap(self):
         """ Get the current 2-D board.
         For separation of concerns.
 
+        The map is built from the board on first use and cached until
+        the next move, so it must not be modified by the caller.
+
         Output:
             List object, represents the chess map in 2-D
         List.
         """
+        if self.__chessMap is None:
+            board = self.__board
+            self.__chessMap = [[board_states[board[row * n + col]]
+                                for col in range(n)] for row in range(n)]
         return self.__chessMap
 
     def get_position_state(self, row, col):
@@ -65,7 +267,7 @@ class Reversi(object):
             BoardState object, represents the state in a
         specific position.
         """
-        return self.__chessMap[row][col]
+        return board_states[self.__board[row * n + col]]
 
     def get_chess_count(self):
         """ Get the total number of chesses in black and white.
@@ -139,14 +341,132 @@ class Reversi(object):
                     elif chessMap[row][col] == BoardState.White:
                         WhiteCount += 1
 
-        self.__chessMap = chessMap
+        self.__board = bytearray(chessMap[row][col].value
+                                 for row in range(n) for col in range(n))
         self.__BlackCount = BlackCount
         self.__WhiteCount = WhiteCount
         self.__currentState = currentState
+        self.__clear_cache()
+
+    def __compute_hash(self):
+        """Compute the Zobrist hash of the pieces from scratch."""
+        key = 0
+        for square in range(n_squared):
+            key ^= symmetric_piece[square][self.__board[square]]
+        return key
+
+    def __compute_weight(self):
+        """Compute the weighted piece difference from scratch."""
+        weight = 0
+        for row in range(n):
+            for col in range(n):
+                value = self.__board[row * n + col]
+                if value == BoardState.Black.value:
+                    weight += weight_matrix[row][col]
+                elif value == BoardState.White.value:
+                    weight -= weight_matrix[row][col]
+        return weight
+
+    def get_weight_score(self):
+        """ Get weight_matrix summed over the black pieces minus the
+        white pieces, which is updated incrementally by every move.
+
+        Output:
+            Int object.
+        """
+        return self.__weight
+
+    def get_bitboards(self):
+        """ Get the position as bitboards, square (row, col) being
+        the bit row * n + col.
+
+        Output:
+            Tuple object (black bits, white bits).
+        """
+        black = 0
+        white = 0
+        for square in range(n_squared):
+            if self.__board[square] == BoardState.Black.value:
+                black |= 1 << square
+            elif self.__board[square] == BoardState.White.value:
+                white |= 1 << square
+        return (black, white)
+
+    def get_hash(self):
+        """ Get the Zobrist hash of the position, which is updated
+        incrementally by every move.
+
+        Output:
+            Int object, a 64-bit key including the side to move.
+        """
+        return self.__side_hash() & hash_mask
+
+    def get_canonical_hash(self):
+        """ Get the Zobrist hash of the canonical form of the position,
+        the same for all 8 symmetric images of it.
+
+        Output:
+            Tuple object (key, sym): the 64-bit key, and the symmetry
+        that maps the board onto its canonical form.
+        """
+        return canonical_hash(self.__side_hash())
+
+    def get_canonical(self):
+        """ Get the canonical form of the position: the smallest of its
+        8 symmetric images.
+
+        Output:
+            Tuple object (own, oppo, sym): the bitboards of the player
+        to move and the opponent, and the symmetry producing them.
+        """
+        (black, white) = self.get_bitboards()
+        if self.__currentState == BoardState.Black:
+            return canonical_bits(black, white)
+        return canonical_bits(white, black)
+
+    def __side_hash(self):
+        """Packed symmetric hash including the side to move."""
+        if self.__currentState == BoardState.White:
+            return self.__hash ^ symmetric_white_turn
+        return self.__hash
+
+    def __clear_cache(self):
+        """Drop the cached legal moves after the position changed."""
+        self.__chessMap = None
+        self.__legal = {}
+        self.__availability_map = None
+
+    def __legal_of(self, self_state):
+        """Returns the cached (move list, flips dict) of self_state,
+        generating them in one pass over the board when missing.
+        """
+        legal = self.__legal.get(self_state)
+        if legal is None:
+            self_value = self_state.value
+            oppo_value = self.get_reverse_state(self_state).value
+            board = self.__board
+            moves = []
+            flips = {}
+            for square in range(n_squared):
+                if board[square]:
+                    continue
+                flipped = self.__find_flips(square, self_value, oppo_value)
+                if flipped:
+                    (row, col) = square_positions[square]
+                    flipped_bits = 0
+                    for (flip_row, flip_col) in flipped:
+                        flipped_bits |= 1 << (flip_row * n + flip_col)
+                    moves.append((row, col, flipped_bits))
+                    flips[(row, col)] = (flipped, flipped_bits)
+
+            legal = (moves, flips)
+            self.__legal[self_state] = legal
+        return legal
 
     def swap_state(self):
         """Move the currentState to the other player."""
         self.__currentState = self.get_opponent_state()
+        self.__clear_cache()
 
     def position_test(self, pos_row, pos_col):
         """Check whether (pow_row, pos_col) is a valid position.
@@ -159,85 +479,87 @@ class Reversi(object):
                pos_col >= 0 and \
                pos_col < n
 
-    def __extend(
-            self,
-            pos_row,
-            pos_col,
-            self_state,
-            oppo_state,
-            xshift,
-            yshift
-        ):
-
-        """Check whether (pow_row, pos_col) is a valid position.
+    def __extend(self, ray, self_value, oppo_value):
+        """Count the pieces a move would flip along one ray.
 
         Input:
-            pos_row, pos_col: Position of the possible move position.
-            self_state, oppo_state: BoardState objects.
-            xshift, yshift: Shift vector.
+            ray: Tuple object, the squares from the move position to
+        the edge of the board, taken from square_rays.
+            self_value, oppo_value: Int objects, the BoardState values
+        of the two players.
         Output:
-            Tuple object consisting of succeed status and flip.
-        count.
+            Int object, the number of flipped pieces at the start of
+        the ray, 0 when they are not anchored by a self_value piece.
         """
+        board = self.__board
         count = 0
-        flag = True
-        if_succeed = False
-
-        while flag:
-            pos_row += xshift
-            pos_col += yshift
-            if self.position_test(pos_row, pos_col):
-                if self.__chessMap[pos_row][pos_col] == oppo_state:
-                    # Another piece to flip
-                    count += 1
-                elif self.__chessMap[pos_row][pos_col] == self_state:
-                    # Connected with anchored piece, Success
-                    if count > 0:
-                        if_succeed = True
-                    flag = False
-                else:
-                    # Failed to connect with anchored piece - Empty position
-                    flag = False
+        for square in ray:
+            value = board[square]
+            if value == oppo_value:
+                # Another piece to flip
+                count += 1
+            elif value == self_value:
+                # Connected with anchored piece
+                return count
             else:
-                # Failed to connect with anchored piece - Out of board
-                flag = False
-
-        return (if_succeed, count)
+                # Failed to connect with anchored piece - Empty position
+                return 0
+        # Failed to connect with anchored piece - Out of board
+        return 0
 
-    def __flip(self, pos_row, pos_col, self_state, oppo_state):
-        """Flip the related pieces after the move.
+    def __find_flips(self, square, self_value, oppo_value):
+        """Find the pieces that a move would flip, without changing the
+        board.
 
         Input:
-            pos_row, pos_col: Position of the possible move position.
-            self_state, oppo_state: BoardState objects.
+            square: Int object, the move position row * n + col.
+            self_value, oppo_value: Int objects, the BoardState values
+        of the two players.
         Output:
-            Tuple object consisting of change in counts for both sides.
-        count.
+            Tuple object consisting of the flipped positions, empty
+        when the move is invalid.
         """
-        flip_count = 0
-
-        for (xshift, yshift) in pos_shift:
-            (extend_success, extend_count) = self.__extend(
-                pos_row, pos_col, self_state, oppo_state, xshift, yshift)
-            if extend_success:
-                new_row = pos_row
-                new_col = pos_col
-                for counter in range(extend_count):
-                    new_row += xshift
-                    new_col += yshift
-                    self.__chessMap[new_row][new_col] = self_state
-                flip_count += extend_count
+        flipped = []
+
+        for ray in square_rays[square]:
+            count = self.__extend(ray, self_value, oppo_value)
+            for flip_square in ray[:count]:
+                flipped.append(square_positions[flip_square])
+
+        return tuple(flipped)
 
+    def __add_count(self, self_state, placed, flip_count):
+        """Shift the piece counters after placing (placed = 1) or
+        removing (placed = -1) a piece of self_state which flipped
+        flip_count opponent pieces.
+        """
         if self_state == BoardState.Black:
-            return (flip_count, -flip_count)
+            self.__BlackCount += placed * (1 + flip_count)
+            self.__WhiteCount -= placed * flip_count
         elif self_state == BoardState.White:
-            return (-flip_count, flip_count)
-        raise ValueError('Unknown Board State')
+            self.__WhiteCount += placed * (1 + flip_count)
+            self.__BlackCount -= placed * flip_count
+        else:
+            raise ValueError('Unknown Board State')
+
+    def __add_weight(self, self_state, placed, pos_row, pos_col, flipped):
+        """Shift the weighted piece difference after placing
+        (placed = 1) or removing (placed = -1) a piece of self_state
+        which flipped the given positions.
+        """
+        delta = weight_matrix[pos_row][pos_col]
+        for (row, col) in flipped:
+            delta += 2 * weight_matrix[row][col]
+        if self_state == BoardState.Black:
+            self.__weight += placed * delta
+        else:
+            self.__weight -= placed * delta
 
     def __next(self):
-        """Switch the current State of player.
+        """Switch the current State of player. The move generation of
+        the opponent is kept as the legal move cache of the next turn.
         """
-        if self.check_availability(self.get_opponent_state()):
+        if self.__legal_of(self.get_opponent_state())[0]:
             self.__currentState = self.get_opponent_state()
         return
 
@@ -253,14 +575,12 @@ class Reversi(object):
                 return (False, 'Row index out of range')
             if pos_col < 0 or pos_col >= n:
                 return (False, 'Column index out of range')
-        if self.__chessMap[pos_row][pos_col] != BoardState.Empty:
+        if self.__board[pos_row * n + pos_col]:
             return (False, 'Designated position is not empty')
 
         flag = False
-        for (xshift, yshift) in pos_shift:
-            (extend_success, extend_count) = self.__extend(
-                pos_row, pos_col, self_state, oppo_state, xshift, yshift)
-            if extend_success:
+        for ray in square_rays[pos_row * n + pos_col]:
+            if self.__extend(ray, self_state.value, oppo_state.value):
                 flag = True
                 break
 
@@ -277,32 +597,94 @@ class Reversi(object):
             safety_check: Bool object, indicate whether it is
         necessary to perform check beforehand. The parameter is given
         to boost performance.
+        Output:
+            Tuple object, the undo record (pos_row, pos_col, flipped
+        bits, moving state) of the move, the same as in BitboardReversi.
+        self.undo_move() takes the move back.
         """
+        self_state = self.__currentState
         oppo_state = self.get_opponent_state()
 
         if safety_check:
             if type(pos_row) != int or type(pos_col) != int:
                 raise ValueError('Position data must be int')
-            (valid, error_description) = self.validity_test(
-                pos_row, pos_col, self.__currentState, oppo_state)
-            if not valid:
+            if (pos_row, pos_col) not in self.__legal_of(self_state)[1]:
+                (valid, error_description) = self.validity_test(
+                    pos_row, pos_col, self_state, oppo_state)
                 raise Exception(error_description)
 
-        self.__chessMap[pos_row][pos_col] = self.__currentState
-        if self.__currentState == BoardState.Black:
-            self.__BlackCount += 1
-        elif self.__currentState == BoardState.White:
-            self.__WhiteCount += 1
-
-        (black_count_shift, white_count_shift) = self.__flip(
-            pos_row, pos_col, self.__currentState, oppo_state)
-        self.__BlackCount += black_count_shift
-        self.__WhiteCount += white_count_shift
+        """ Reuse the flips found by legal_moves() when available. """
+        flips = None
+        if self_state in self.__legal:
+            flips = self.__legal[self_state][1].get((pos_row, pos_col))
+        if flips is None:
+            flipped = self.__find_flips(
+                pos_row * n + pos_col, self_state.value, oppo_state.value)
+            flipped_bits = 0
+            for (row, col) in flipped:
+                flipped_bits |= 1 << (row * n + col)
+        else:
+            (flipped, flipped_bits) = flips
+
+        self.__board[pos_row * n + pos_col] = self_state.value
+        self.__hash ^= symmetric_piece[pos_row * n + pos_col][
+            self_state.value]
+        for (row, col) in flipped:
+            self.__board[row * n + col] = self_state.value
+            self.__hash ^= symmetric_flip[row * n + col]
+        self.__add_count(self_state, 1, len(flipped))
+        self.__add_weight(self_state, 1, pos_row, pos_col, flipped)
         if self.__BlackCount < 0 or self.__WhiteCount < 0:
             raise ValueError('Negative Counter')
 
+        record = (pos_row, pos_col, flipped_bits, self_state)
+        self.__history.append((record, flipped, self.__legal))
+        self.__clear_cache()
+
         self.__next()
-        return
+        return record
+
+    def undo_move(self):
+        """Take back the last move made with self.move().
+
+        Output:
+            Tuple object, the undo record of the move taken back.
+        """
+        if not self.__history:
+            raise Exception('No move to undo')
+
+        (record, flipped, legal) = self.__history.pop()
+        (pos_row, pos_col, flipped_bits, self_state) = record
+        oppo_state = self.get_reverse_state(self_state)
+
+        self.__board[pos_row * n + pos_col] = BoardState.Empty.value
+        self.__hash ^= symmetric_piece[pos_row * n + pos_col][
+            self_state.value]
+        for (row, col) in flipped:
+            self.__board[row * n + col] = oppo_state.value
+            self.__hash ^= symmetric_flip[row * n + col]
+        self.__add_count(self_state, -1, len(flipped))
+        self.__add_weight(self_state, -1, pos_row, pos_col, flipped)
+        self.__currentState = self_state
+        self.__chessMap = None
+        self.__legal = legal
+        self.__availability_map = None
+
+        return record
+
+    def legal_moves(self):
+        """Generate the legal moves of the current player together
+        with the pieces each of them flips.
+
+        The result is computed once per position and cached until
+        the next move, so it must not be modified by the caller.
+
+        Output:
+            List object of (pos_row, pos_col, flipped bits) tuples, in
+        row-major order. Bit row * n + col of flipped bits is set for
+        every piece the move flips, the same as in BitboardReversi.
+        """
+        return self.__legal_of(self.__currentState)[0]
 
     #----------Status Check----------#
     def check_availability(self, self_state=None):
@@ -319,22 +701,7 @@ class Reversi(object):
         if self_state is None:
             self_state = self.__currentState
 
-        oppo_state = self.get_reverse_state(self_state)
-        flag = False
-        for row in range(n):
-            for col in range(n):
-                (valid, error_description) = self.validity_test(
-                    row, 
-                    col,
-                    self_state,
-                    oppo_state
-                )
-                if valid:
-                    flag = True
-                    break
-            if flag:
-                break
-        return flag
+        return len(self.__legal_of(self_state)[0]) > 0
 
     def check_winning_status(self):
         """Check the winner status.
@@ -348,7 +715,8 @@ class Reversi(object):
 
         if self.__BlackCount + self.__WhiteCount == n_squared:
             Finished = True
-        elif not self.check_availability() and not self.check_availability(self.get_opponent_state()):
+        elif not self.check_availability() and \
+                not self.check_availability(self.get_opponent_state()):
             Finished = True
 
         if Finished:
@@ -364,28 +732,23 @@ class Reversi(object):
     def get_availability_map(self):
         """Returns the possible position for the current move.
 
-        Cooperates with ReversiInterface.draw_availability_map().
+        Cooperates with ReversiInterface.draw_availability_map(). The
+        map is cached until the next move, so it must not be modified
+        by the caller.
 
         Output:
             2D List with available positions.
         """
-        self_state = self.__currentState
-        oppo_state = self.get_reverse_state(self_state)
+        if self.__availability_map is None:
+            self_state = self.__currentState
 
-        """
-        The following line is faster than deepcopy().
-        """
-        ava_map = [[BoardState.Empty for j in range(n)] for i in range(n)]
-        flag = False
-        for row in range(n):
-            for col in range(n):
-                (valid, error_description) = self.validity_test(
-                    row,
-                    col,
-                    self_state,
-                    oppo_state
-                )
-                if valid:
-                    ava_map[row][col] = self_state
-
-        return ava_map
+            """
+            The following line is faster than deepcopy().
+            """
+            ava_map = [[BoardState.Empty for j in range(n)]
+                       for i in range(n)]
+            for (row, col, flipped) in self.legal_moves():
+                ava_map[row][col] = self_state
+            self.__availability_map = ava_map
+
+        return self.__availability_map
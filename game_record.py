@@ -0,0 +1,311 @@
+""" game_record.py
+
+Contains the compact binary game record format, its streaming writer
+and reader.
+
+A record file starts with a short magic string followed by the games,
+back to back. Each game is a fixed-size header with the result and the
+engine settings, then one byte per ply: the square row * n + col of a
+move, or pass_square when the side to move had to pass. A 60 move game
+takes 71 bytes.
+
+Execution:
+    ```bash
+    $ python selfplay.py --games 100 --record games.rvg
+    $ python game_record.py games.rvg --replay
+    $ python game_record.py games.rvg --index 42
+    ```
+"""
+
+import argparse
+import json
+import os
+import struct
+
+from const import *
+from core import Reversi
+from bitboard import BitboardReversi
+
+record_magic = b'RVGAME01'
+pass_square = n_squared
+
+""" Header: winner state value, black count, white count, black depth,
+white depth, random opening plies, time limit in milliseconds
+(no_time_limit for fixed depth), number of plies. Big-endian.
+"""
+record_header = struct.Struct('>BBBBBBIB')
+no_time_limit = 0xFFFFFFFF
+max_setting = 0xFF
+
+
+def insert_passes(moves):
+    """ Mark the passes of a game given by its moves only.
+
+    Input:
+        moves: List object of (row, col) moves, in the order played.
+    Output:
+        List object of (row, col) moves and None for each pass.
+    """
+    reversi = BitboardReversi()
+    plies = []
+    for (pos_row, pos_col) in moves:
+        if plies and reversi.get_current_state() == last_state:
+            plies.append(None)
+        last_state = reversi.get_current_state()
+        reversi.move(pos_row, pos_col, safety_check=True)
+        plies.append((pos_row, pos_col))
+    return plies
+
+
+class GameRecord(object):
+    """GameRecord object holding one decoded game.
+
+    Attributes:
+        winner: BoardState object. Empty for a draw.
+        black, white: int. the final piece counts.
+        black_depth, white_depth: int. the search depth of each side.
+        opening: int. the number of random plies before the AIs played.
+        time_limit: float. the time budget of each AI move in seconds,
+    None for fixed depth.
+        squares: Bytes object. one square per ply, pass_square for a
+    pass.
+    """
+    def __init__(self, winner, black, white, black_depth, white_depth,
+                 opening, time_limit, squares):
+        self.winner = winner
+        self.black = black
+        self.white = white
+        self.black_depth = black_depth
+        self.white_depth = white_depth
+        self.opening = opening
+        self.time_limit = time_limit
+        self.squares = squares
+
+    def plies(self):
+        """ Generate the plies as (row, col) moves and None for passes.
+        """
+        for square in self.squares:
+            if square == pass_square:
+                yield None
+            else:
+                yield (square // n, square % n)
+
+    def moves(self):
+        """ Returns the list of (row, col) moves, without the passes. """
+        return [(square // n, square % n) for square in self.squares
+                if square != pass_square]
+
+    def replay(self, reversi=None, safety_check=True):
+        """ Play the game on a board.
+
+        Input:
+            reversi: Reversi or BitboardReversi object at the initial
+        position, a new board of the engine chosen by Use_Bitboard by
+        default.
+            safety_check: Bool object, whether to check every move and
+        pass. Only trusted records should be replayed without it.
+        Output:
+            The board at the end of the game.
+        """
+        if reversi is None:
+            if Use_Bitboard:
+                reversi = BitboardReversi()
+            else:
+                reversi = Reversi()
+        mover = reversi.get_current_state()
+        for square in self.squares:
+            if square == pass_square:
+                if safety_check and reversi.get_current_state() == mover:
+                    raise Exception('Pass with legal moves left')
+                mover = reversi.get_reverse_state(mover)
+                continue
+            if safety_check and reversi.get_current_state() != mover:
+                raise Exception('Missing pass')
+            reversi.move(square // n, square % n, safety_check)
+            mover = reversi.get_reverse_state(mover)
+
+        if safety_check:
+            (Finished, Winner) = reversi.check_winning_status()
+            if not Finished or Winner != self.winner or \
+               reversi.get_chess_count() != (self.black, self.white):
+                raise Exception('Replay does not match the result')
+        return reversi
+
+    def to_dict(self):
+        """ Returns the game in the JSON form of selfplay.py. """
+        return {
+            'black_depth': self.black_depth,
+            'white_depth': self.white_depth,
+            'opening': self.opening,
+            'time_limit': self.time_limit,
+            'moves': [list(move) for move in self.moves()],
+            'black': self.black,
+            'white': self.white,
+            'winner': self.winner.name.lower()
+        }
+
+
+class GameRecordWriter(object):
+    """GameRecordWriter object that appends games to a record file.
+
+    Attributes:
+        __file: File object. the record file, open for appending.
+    """
+    def __init__(self, path):
+        self.__file = open(path, 'a+b')
+        self.__file.seek(0)
+        magic = self.__file.read(len(record_magic))
+        if not magic:
+            self.__file.write(record_magic)
+        elif magic != record_magic:
+            self.close()
+            raise Exception('Not a game record file: ' + path)
+
+    def write(self, plies, winner, black, white, black_depth=0,
+              white_depth=0, opening=0, time_limit=None):
+        """ Append one game.
+
+        Input:
+            plies: Iterable of (row, col) moves and None for passes, as
+        returned by insert_passes().
+            The rest are the attributes of GameRecord. The depths and
+        opening must be at most max_setting.
+        """
+        squares = bytes(pass_square if ply is None else ply[0] * n + ply[1]
+                        for ply in plies)
+        if len(squares) > 255:
+            raise ValueError('Too many plies')
+        for setting in (black_depth, white_depth, opening):
+            if not 0 <= setting <= max_setting:
+                raise ValueError('Setting out of range: ' + str(setting))
+        if time_limit is None:
+            milliseconds = no_time_limit
+        else:
+            milliseconds = int(round(time_limit * 1000))
+            if not 0 <= milliseconds < no_time_limit:
+                raise ValueError('Time limit out of range')
+        self.__file.write(record_header.pack(
+            winner.value, black, white, black_depth, white_depth, opening,
+            milliseconds, len(squares)) + squares)
+
+    def flush(self):
+        """ Push the written games to the file. """
+        self.__file.flush()
+
+    def close(self):
+        """ Release the file. """
+        self.__file.close()
+
+
+class GameRecordReader(object):
+    """GameRecordReader object that streams games from a record file.
+
+    Iterating reads the games one at a time, so files of any size are
+    read in constant memory. Seeking by index builds an offset index on
+    its first use by reading only the headers.
+
+    Attributes:
+        __file: File object. the record file.
+        __offsets: List object. the file offset of every game, None
+    until the first seek.
+    """
+    def __init__(self, path):
+        self.__file = open(path, 'rb')
+        if self.__file.read(len(record_magic)) != record_magic:
+            self.close()
+            raise Exception('Not a game record file: ' + path)
+        self.__offsets = None
+
+    def __iter__(self):
+        offset = len(record_magic)
+        while True:
+            """ Seek back every time, as seek() may have moved the file
+            position while the caller held the last game.
+            """
+            self.__file.seek(offset)
+            record = self.__read()
+            if record is None:
+                return
+            offset = self.__file.tell()
+            yield record
+
+    def __len__(self):
+        return len(self.__index())
+
+    def __getitem__(self, index):
+        return self.seek(index)
+
+    def close(self):
+        """ Release the file. """
+        self.__file.close()
+
+    def __read(self):
+        """ Read the game at the file position, None at the end. """
+        header = self.__file.read(record_header.size)
+        if not header:
+            return None
+        if len(header) < record_header.size:
+            raise Exception('Truncated game record')
+        (winner, black, white, black_depth, white_depth, opening,
+         milliseconds, count) = record_header.unpack(header)
+        squares = self.__file.read(count)
+        if len(squares) < count:
+            raise Exception('Truncated game record')
+        time_limit = None
+        if milliseconds != no_time_limit:
+            time_limit = milliseconds / 1000
+        return GameRecord(BoardState(winner), black, white, black_depth,
+                          white_depth, opening, time_limit, squares)
+
+    def __index(self):
+        """ Find the offset of every game, skipping over the plies. """
+        if self.__offsets is None:
+            offsets = []
+            size = os.fstat(self.__file.fileno()).st_size
+            offset = len(record_magic)
+            while offset < size:
+                offsets.append(offset)
+                self.__file.seek(offset + record_header.size - 1)
+                count = self.__file.read(1)
+                if not count:
+                    raise Exception('Truncated game record')
+                offset += record_header.size + count[0]
+            self.__offsets = offsets
+        return self.__offsets
+
+    def seek(self, index):
+        """ Read the game of an index.
+
+        Output:
+            GameRecord object.
+        """
+        self.__file.seek(self.__index()[index])
+        return self.__read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Print the games of a game record file.')
+    parser.add_argument('path')
+    parser.add_argument('--index', type=int, default=None,
+                        help='print only the game of this index')
+    parser.add_argument('--replay', action='store_true',
+                        help='check every game by replaying it')
+    args = parser.parse_args(argv)
+
+    reader = GameRecordReader(args.path)
+    try:
+        if args.index is not None:
+            records = [reader.seek(args.index)]
+        else:
+            records = reader
+        for record in records:
+            if args.replay:
+                record.replay()
+            print(json.dumps(record.to_dict()))
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
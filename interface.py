@@ -6,7 +6,6 @@ Contains the Reversi Interface class.
 import pygame
 from pygame.locals import *
 from const import *
-from core import *
 
 """ Initialization """
 
@@ -35,21 +34,54 @@ class ReversiInterface(object):
     """ReversiInterface object that connects Reverse with User
     Interface. Draws the board throughout the game.
 
+    The board and its pieces are kept on a persistent surface, on
+    which redraw() only repaints the squares that changed. Hints, the
+    hover ghost and the other overlays are collected until update(),
+    which pushes only the changed rectangles to the display.
+
     Attributes:
         reversi: reversi object.
+        __board_surface: Surface object. the board with its pieces and
+    piece counts.
+        __drawn: List object. the state of every square = row * n + col
+    on __board_surface, None before the first redraw().
+        __counts: Tuple object. the piece counts on __board_surface.
+        __count_size: Tuple object. the size of the box a count is
+    drawn in, that of the widest count text.
+        __changed: List object. the rectangles of __board_surface
+    repainted since the last update().
+        __overlays: List object. the (image, position) overlays on the
+    display.
+        __pending: List object. the overlays to show at the next
+    update().
     """
 
     def __init__(self, reversi):
         self.reversi = reversi
 
-        # Initialize pygame.
+        # Initialize the pygame modules in use, not audio and joystick.
 
-        pygame.init()
+        pygame.display.init()
+        pygame.font.init()
 
         self.__screen = pygame.display.set_mode((img_Width, img_Height), 0, 32)
         pygame.display.set_caption('Othello')
 
-        # Load UI resources
+        # UI resources are loaded by the first draw.
+        self.__img_chessboard = None
+        self.__drawn = None
+        self.__counts = None
+        self.__changed = []
+        self.__overlays = []
+        self.__pending = []
+
+    def __load_assets(self):
+        """ Load the images and render the text and translucent pieces,
+        once, on first use.
+        """
+        if self.__img_chessboard is not None:
+            return
+
         self.__img_chessboard = pygame.image.load(
             Image_Path + 'chessboard.png').convert()
         self.__img_piece_black = pygame.image.load(
@@ -59,7 +91,44 @@ class ReversiInterface(object):
         self.__img_piece_hint = pygame.image.load(
             Image_Path + 'c_hint.png').convert_alpha()
 
-    
+        self.__font_count = pygame.font.SysFont('Consolas', 44)
+        self.__font_winner = pygame.font.SysFont('Arial', 55)
+        self.__font_thinking = pygame.font.SysFont('Arial', 28)
+
+        self.__img_pieces = {
+            BoardState.Black: self.__img_piece_black,
+            BoardState.White: self.__img_piece_white
+        }
+        self.__img_ghosts = {
+            state: self.translucent(image, 128)
+            for (state, image) in self.__img_pieces.items()
+        }
+        self.__img_counts = {
+            BoardState.Black: [
+                self.__font_count.render(str(count).zfill(2), True,
+                                         (27, 27, 27))
+                for count in range(n_squared + 1)],
+            BoardState.White: [
+                self.__font_count.render(str(count).zfill(2), True,
+                                         (236, 236, 236))
+                for count in range(n_squared + 1)]
+        }
+        """ The digits of the fallback font differ in width, so a count
+        is always repainted over the box of the widest one.
+        """
+        self.__count_size = (
+            max(text.get_width() for texts in self.__img_counts.values()
+                for text in texts),
+            max(text.get_height() for texts in self.__img_counts.values()
+                for text in texts))
+        self.__img_thinking = [
+            self.__font_thinking.render('Thinking' + '.' * dots, True,
+                                        (142, 202, 255))
+            for dots in range(4)]
+        self.__img_winners = {}
+
+        self.__board_surface = self.__img_chessboard.copy()
+
     def blit_alpha(self, target, source, location, opacity):
         """ Draws transparent image on window.
 
@@ -75,6 +144,14 @@ class ReversiInterface(object):
         temp.set_alpha(opacity)
         target.blit(temp, location)
 
+    def translucent(self, source, opacity):
+        """ Returns a copy of an image with per-pixel alpha, scaled
+        by opacity / 255, to be blitted without blit_alpha().
+        """
+        image = source.copy()
+        image.fill((255, 255, 255, opacity), special_flags=BLEND_RGBA_MULT)
+        return image
+
     def transform_index2pixel(self, pos_row, pos_col):
         """ Returns the window position according to the board
         position.
@@ -91,53 +168,111 @@ class ReversiInterface(object):
         (i, j) = (int((y - Top) / Grid_Size), int((x - Left) / Grid_Size))
         return (i, j)
 
+    def __repaint(self, rect):
+        """ Restore a rectangle of the board surface to the bare board
+        image, and mark it changed.
+        """
+        self.__board_surface.blit(self.__img_chessboard, rect, rect)
+        self.__changed.append(rect)
+
     def redraw(self):
-        """ Draws the board."""
+        """ Draws the board.
 
-        """ Board Image """
-        self.__screen.blit(self.__img_chessboard, (0, 0))
+        Only the squares whose state changed since the last redraw(),
+        and the counts when they changed, are repainted. The overlays
+        drawn before the last update() are dropped.
+        """
+        self.__load_assets()
+        self.__pending = []
+        if self.__drawn is None:
+            self.__board_surface.blit(self.__img_chessboard, (0, 0))
+            self.__changed.append(self.__screen.get_rect())
+            self.__drawn = [BoardState.Empty] * n_squared
+
+            """ Info Panel """
+            pygame.draw.circle(self.__board_surface, (27, 27, 27),
+                               (525, 83), 20)
+            pygame.draw.circle(self.__board_surface, (64, 64, 64),
+                               (525, 83), 20, 2)
+            pygame.draw.circle(self.__board_surface, (244, 255, 250),
+                               (525, 173), 20)
+            pygame.draw.circle(self.__board_surface, (188, 194, 192),
+                               (525, 173), 20, 2)
 
         """ Chess Image """
         for row in range(0, n):
             for col in range(0, n):
                 state = self.reversi.get_position_state(row, col)
+                if state == self.__drawn[row * n + col]:
+                    continue
 
+                (x, y) = self.transform_index2pixel(row, col)
+                rect = self.__img_piece_black.get_rect(
+                    topleft=(int(x), int(y)))
+                self.__repaint(rect)
                 if state != BoardState.Empty:
-                    (x, y) = self.transform_index2pixel(row, col)
-                    if state == BoardState.Black:
-                        self.__screen.blit(self.__img_piece_black, (x, y))
-                    elif state == BoardState.White:
-                        self.__screen.blit(self.__img_piece_white, (x, y))
+                    self.__board_surface.blit(self.__img_pieces[state],
+                                              rect)
+                self.__drawn[row * n + col] = state
 
         """ Info Panel """
-        font = pygame.font.SysFont('Consolas', 44)
-        cur_black, cur_white = self.reversi.get_chess_count()
-
-        text = font.render(str(cur_black).zfill(2), True, (27, 27, 27))
-        pygame.draw.circle(self.__screen, (27, 27, 27), (525, 83), 20)
-        pygame.draw.circle(self.__screen, (64, 64, 64), (525, 83), 20, 2)
-        self.__screen.blit(text, (574, 69))
-
-        text = font.render(str(cur_white).zfill(2), True, (236, 236, 236))
-        pygame.draw.circle(self.__screen, (244, 255, 250), (525, 173), 20)
-        pygame.draw.circle(self.__screen, (188, 194, 192), (525, 173), 20, 2)
-        self.__screen.blit(text, (574, 159))
+        counts = self.reversi.get_chess_count()
+        if counts != self.__counts:
+            for (state, count, y) in ((BoardState.Black, counts[0], 69),
+                                      (BoardState.White, counts[1], 159)):
+                self.__repaint(pygame.Rect((574, y), self.__count_size))
+                self.__board_surface.blit(self.__img_counts[state][count],
+                                          (574, y))
+            self.__counts = counts
+
+    def __overlay(self, image, position):
+        """ Show an image above the board from the next update() on.
+        """
+        self.__pending.append((image, (int(position[0]), int(position[1]))))
 
     def update(self):
-        """ Update the board."""
-        pygame.display.update()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                exit()
+        """ Update the board.
+
+        Pushes the rectangles that differ from the display: the
+        repainted parts of the board, and the overlays that appeared
+        or disappeared.
+        """
+        if self.__changed or self.__pending != self.__overlays:
+            dirty = list(self.__changed)
+            for (image, position) in self.__overlays + self.__pending:
+                dirty.append(image.get_rect(topleft=position))
+            for rect in dirty:
+                self.__screen.blit(self.__board_surface, rect, rect)
+            for (image, position) in self.__pending:
+                self.__screen.blit(image, position)
+            pygame.display.update(dirty)
+
+        self.__changed = []
+        self.__overlays = self.__pending
+        self.__pending = []
+
+    def invalidate(self):
+        """ Make the next redraw() repaint the whole window, after it
+        was exposed or the board was replaced.
+        """
+        self.__drawn = None
+        self.__counts = None
 
     #----------Interaction----------#
-    def examine_and_move(self):
-        """ Examine and move when user acts."""
-        mouse_button = pygame.mouse.get_pressed()
-        if not mouse_button[0]:
-            raise Exception('Not a Left Click')
+    def examine_and_move(self, pos=None):
+        """ Examine and move when user acts.
 
-        (x, y) = pygame.mouse.get_pos()
+        Input:
+            pos: Tuple object (x, y), the position of the left click.
+        By default the current mouse state is read.
+        """
+        if pos is None:
+            mouse_button = pygame.mouse.get_pressed()
+            if not mouse_button[0]:
+                raise Exception('Not a Left Click')
+            pos = pygame.mouse.get_pos()
+
+        (x, y) = pos
         (pos_row, pos_col) = self.transform_pixel2index(x, y)
 
         if pos_row is None:
@@ -152,23 +287,36 @@ class ReversiInterface(object):
 
     def draw_winner(self, result):
         """ Draw the Winning Info """
-        font = pygame.font.SysFont('Arial', 55)
-        tips = 'Game Over:'
-        if result == BoardState.Black:
-            tips = tips + 'Black Wins'
-        elif result == BoardState.White:
-            tips = tips + 'White Wins'
-        else:
-            tips = tips + 'Draw'
-        text = font.render(tips, True, (142, 202, 255))
-
-        self.__screen.blit(text, (img_Width / 2 - 200, img_Height / 2 - 50))
+        self.__load_assets()
+        if result not in self.__img_winners:
+            tips = 'Game Over:'
+            if result == BoardState.Black:
+                tips = tips + 'Black Wins'
+            elif result == BoardState.White:
+                tips = tips + 'White Wins'
+            else:
+                tips = tips + 'Draw'
+            self.__img_winners[result] = self.__font_winner.render(
+                tips, True, (142, 202, 255))
+
+        self.__overlay(self.__img_winners[result],
+                       (img_Width / 2 - 200, img_Height / 2 - 50))
+
+    def draw_thinking(self):
+        """ Draw the AI thinking indicator in the info panel, with
+        dots that cycle as time passes.
+        """
+        self.__load_assets()
+        dots = pygame.time.get_ticks() // 400 % 4
+        self.__overlay(self.__img_thinking[dots], (505, 250))
 
     def draw_mouse_with_map(self, ava_map):
         """ Display the transparent chess when user moves their
         mouse onto an available position. 
         """
 
+        self.__load_assets()
+
         """ Check the position of pointer """
         (x, y) = pygame.mouse.get_pos()
         (pos_row, pos_col) = self.transform_pixel2index(x, y)
@@ -179,20 +327,12 @@ class ReversiInterface(object):
 
         if ava_map[pos_row][pos_col] == self_state:
             (out_x, out_y) = self.transform_index2pixel(pos_row, pos_col)
-            if self.reversi.get_current_state() == BoardState.Black:
-                self.blit_alpha(self.__screen,
-                                self.__img_piece_black,
-                                (out_x, out_y),
-                                128)
-            else:
-                self.blit_alpha(self.__screen,
-                                self.__img_piece_white,
-                                (out_x, out_y),
-                                128)
+            self.__overlay(self.__img_ghosts[self_state], (out_x, out_y))
 
     def draw_availability_map(self, ava_map=None):
         """ Display the possible position hints for user.
         """
+        self.__load_assets()
         self_state = self.reversi.get_current_state()
         if ava_map is None:
             ava_map = self.reversi.get_availability_map()
@@ -201,6 +341,6 @@ class ReversiInterface(object):
             for col in range(0, n):
                 if ava_map[row][col] == self_state:
                     (x, y) = self.transform_index2pixel(row, col)
-                    self.__screen.blit(self.__img_piece_hint, (x + 1, y + 2))
+                    self.__overlay(self.__img_piece_hint, (x + 1, y + 2))
 
         return ava_map
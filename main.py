@@ -31,11 +31,15 @@ See const.py for attribute list.
 import pygame
 from pygame.locals import *
 from sys import exit
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
 
 from const import *
 from core import *
+from bitboard import *
 from interface import *
 from reversi_AI_search import *
+from opening_book import open_book
 
 
 def player_status(currentColor, playerList):
@@ -59,12 +63,20 @@ def player_status(currentColor, playerList):
     else:
         raise Exception('Unknown Color Status')
 
+""" Frame rate cap of the window loops. """
+FPS = 30
+
+
 def Human_turn(reversi, interface):
     """ Human_turn function with no output.
 
     Catch the current player move in interface object and react
     accordingly.
 
+    The loop sleeps until an event arrives, handles every queued
+    event at once, so that a burst of mouse motion costs a single
+    frame, and only redraws when the hovered square changes.
+
     Input:
         reversi: Reversi object.
         interface: ReversiInterface object.
@@ -73,49 +85,98 @@ def Human_turn(reversi, interface):
         None.
     """
     ava_map = None
-    while True:
+    clock = pygame.time.Clock()
+    hovered = interface.transform_pixel2index(*pygame.mouse.get_pos())
+    dirty = True
+    moved = False
 
-        interface.redraw()
-        ava_map = interface.draw_availability_map(ava_map=ava_map)
-        interface.draw_mouse_with_map(ava_map)
-        interface.update()
+    while not moved:
+        if dirty:
+            interface.redraw()
+            ava_map = interface.draw_availability_map(ava_map=ava_map)
+            interface.draw_mouse_with_map(ava_map)
+            interface.update()
+            dirty = False
 
         '''
         Catch the current player move.
         '''
-        event = pygame.event.wait()
-        if event.type == QUIT:
-            exit()
-        elif event.type == MOUSEBUTTONDOWN:
-            try:
-                '''
-                Examine the validity of move and Move.
-                '''
-                row, col = interface.examine_and_move()
-                print('Human:', (row, col))
-                break
-            except Exception as e:
-                print('Human:', e)
+        events = [pygame.event.wait()] + pygame.event.get()
+        for (index, event) in enumerate(events):
+            if event.type == QUIT:
+                exit()
+            elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+                try:
+                    '''
+                    Examine the validity of move and Move.
+                    '''
+                    row, col = interface.examine_and_move(event.pos)
+                    print('Human:', (row, col))
+                    moved = True
+                except Exception as e:
+                    print('Human:', e)
+                if moved:
+                    '''
+                    Put the events after the move back in the queue,
+                    so that the next turn sees a QUIT among them.
+                    '''
+                    for later in events[index + 1:]:
+                        pygame.event.post(later)
+                    break
+            elif event.type == MOUSEMOTION:
+                square = interface.transform_pixel2index(*event.pos)
+                if square != hovered:
+                    hovered = square
+                    dirty = True
+            elif event.type == VIDEOEXPOSE:
+                interface.invalidate()
+                dirty = True
+
+        clock.tick(FPS)
 
     interface.redraw()
     interface.update()
 
     return
 
-def AI_turn(Reversi_AI, interface):
+def AI_turn(Reversi_AI, interface, executor):
     """ AI_turn function with no output.
 
-    Make the move and display the move on the interface.
+    Make the move and display the move on the interface. The search
+    runs on the executor, while this loop keeps the window drawn and
+    responsive; closing the window cancels the search.
 
     Input:
-        reversi: Reversi object.
+        Reversi_AI: ReversiAI object.
         interface: ReversiInterface object.
+        executor: ThreadPoolExecutor object running the search.
 
     Output:
         None.
     """
+    cancel = Event()
+    future = executor.submit(Reversi_AI.think, AI_Time_Limit, cancel)
+    clock = pygame.time.Clock()
+
     try:
-        (pos_row, pos_col) = Reversi_AI.think()
+        while not future.done():
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    exit()
+            interface.redraw()
+            interface.draw_thinking()
+            interface.update()
+            clock.tick(FPS)
+    finally:
+        """ Leaving early, by QUIT in particular: stop the search so
+        that the interpreter does not wait for it on exit.
+        """
+        if not future.done():
+            future.cancel()
+            cancel.set()
+
+    try:
+        (pos_row, pos_col) = future.result()
 
         interface.reversi.move(pos_row, pos_col, safety_check=True)
     except Exception as e:
@@ -132,12 +193,16 @@ def main():
     """
     Initialization.
     """
-    reversi = Reversi()
+    if Use_Bitboard:
+        reversi = BitboardReversi()
+    else:
+        reversi = Reversi()
     interface = ReversiInterface(reversi)
     interface.redraw()
     interface.update()
 
-    Reversi_AI = ReversiAI(reversi, depth=AI_Search_Depth)
+    Reversi_AI = ReversiAI(reversi, depth=AI_Search_Depth, book=open_book())
+    executor = ThreadPoolExecutor(max_workers=1)
 
     (Finished, Winner) = (False, None)
 
@@ -154,9 +219,20 @@ def main():
         print('\nState:', reversi.get_current_state())
 
         if current_player == PlayerState.Human:
-            Human_turn(reversi, interface)
+            """
+            Ponder on the human's time. The executor runs one task at
+            a time, so the AI turn starts once pondering has stopped.
+            """
+            ponder_cancel = Event()
+            if AI_Ponder:
+                executor.submit(Reversi_AI.ponder, reversi.copy(),
+                                AI_Time_Limit, ponder_cancel)
+            try:
+                Human_turn(reversi, interface)
+            finally:
+                ponder_cancel.set()
         elif current_player == PlayerState.AI:
-            AI_turn(Reversi_AI, interface)
+            AI_turn(Reversi_AI, interface, executor)
         else:
             raise Exception('Unknown Player Status')
 
@@ -176,6 +252,8 @@ def main():
         if event.type == QUIT:
             exit()
         else:
+            if event.type == VIDEOEXPOSE:
+                interface.invalidate()
             interface.redraw()
             interface.draw_winner(Winner)
             interface.update()
@@ -0,0 +1,280 @@
+""" opening_book.py
+
+Contains the OpeningBook class and the tool that builds its file.
+
+The book maps positions, reduced over the 8 board symmetries and taken
+from the side to move, to a best move. It is stored as a sorted array
+of fixed-size records behind a short header, so a lookup is a binary
+search over a read-only memory map: opening the book reads nothing up
+front, and every process that opens the same file shares its pages.
+
+Execution:
+    ```bash
+    $ python opening_book.py --plies 6 --depth 4 --output book.bin
+    $ python opening_book.py --plies 12 --log games.jsonl --output book.bin
+    ```
+
+    The first form searches every position of the first plies with
+ReversiAI, the second picks the best scoring move of each position
+from selfplay.py logs.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from multiprocessing import Pool
+
+from const import *
+from core import symmetry_squares, inverse_symmetry, canonical_bits
+from bitboard import BitboardReversi
+from reversi_AI_search import ReversiAI
+
+book_magic = b'RVBOOK01'
+
+""" Record: canonical own bits, canonical opponent bits, canonical move
+square, padding, score. Big-endian, so the byte order of the keys is
+their numeric order.
+"""
+book_record = struct.Struct('>QQBxh')
+book_key = struct.Struct('>QQ')
+
+
+def position_bits(reversi):
+    """ Returns the bitboards of a board as (player to move, opponent).
+    """
+    (black, white) = reversi.get_bitboards()
+    if reversi.get_current_state() == BoardState.Black:
+        return (black, white)
+    return (white, black)
+
+
+class OpeningBook(object):
+    """OpeningBook object that looks moves up in a book file.
+
+    Attributes:
+        __file: File object. the open book file.
+        __map: mmap object. the read-only map of the file.
+        __count: int. the number of records.
+    """
+    def __init__(self, path=Opening_Book_Path):
+        self.__file = open(path, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except BaseException:
+            self.__file.close()
+            raise
+        if self.__map[:len(book_magic)] != book_magic:
+            self.close()
+            raise Exception('Not an opening book: ' + path)
+        self.__count = (len(self.__map) - len(book_magic)) // \
+            book_record.size
+
+    def __len__(self):
+        return self.__count
+
+    def close(self):
+        """ Release the memory map and the file. """
+        self.__map.close()
+        self.__file.close()
+
+    def find(self, own, oppo):
+        """ Binary search for a canonical position.
+
+        Output:
+            Tuple object (square, score) in canonical orientation, or
+        None when the position is not in the book.
+        """
+        target = book_key.pack(own, oppo)
+        low = 0
+        high = self.__count
+        while low < high:
+            middle = (low + high) // 2
+            offset = len(book_magic) + middle * book_record.size
+            key = self.__map[offset:offset + book_key.size]
+            if key < target:
+                low = middle + 1
+            elif key > target:
+                high = middle
+            else:
+                (_, _, square, score) = book_record.unpack_from(
+                    self.__map, offset)
+                return (square, score)
+        return None
+
+    def lookup(self, reversi):
+        """ Look up the book move of a board.
+
+        Input:
+            reversi: Reversi or BitboardReversi object.
+        Output:
+            Tuple object (row, col), or None when the position is not
+        in the book.
+        """
+        (own, oppo, sym) = reversi.get_canonical()
+        found = self.find(own, oppo)
+        if found is None:
+            return None
+
+        square = symmetry_squares[inverse_symmetry[sym]][found[0]]
+        (pos_row, pos_col) = (square // n, square % n)
+        for (row, col, flipped) in reversi.legal_moves():
+            if (row, col) == (pos_row, pos_col):
+                return (pos_row, pos_col)
+        return None
+
+
+def open_book(path=Opening_Book_Path):
+    """ Open the opening book, or return None when there is no book
+    file.
+    """
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def write_book(path, entries):
+    """ Write a book file.
+
+    Input:
+        path: String object, the file to write.
+        entries: Iterable of ((own, oppo), square, score), own being the
+    player to move. Positions and moves are canonicalized here, and for
+    a position given several times the highest score is kept.
+    Output:
+        Int object, the number of records written.
+    """
+    records = {}
+    for ((own, oppo), square, score) in entries:
+        (own, oppo, sym) = canonical_bits(own, oppo)
+        score = max(-32768, min(32767, int(score)))
+        if (own, oppo) not in records or records[(own, oppo)][1] < score:
+            records[(own, oppo)] = (symmetry_squares[sym][square], score)
+
+    with open(path, 'wb') as book:
+        book.write(book_magic)
+        for key in sorted(records):
+            (square, score) = records[key]
+            book.write(book_record.pack(key[0], key[1], square, score))
+    return len(records)
+
+
+def opening_positions(plies):
+    """ Collect the positions of the first plies, one per symmetry
+    class.
+
+    Output:
+        List object of (chessMap, currentState) pairs.
+    """
+    reversi = BitboardReversi()
+    seen = set()
+    positions = []
+
+    def walk(ply):
+        if ply >= plies or reversi.check_winning_status()[0]:
+            return
+        (own, oppo, _) = reversi.get_canonical()
+        if (own, oppo) in seen:
+            return
+        seen.add((own, oppo))
+        positions.append((reversi.get_chessMap(),
+                          reversi.get_current_state()))
+        for (row, col, flipped) in list(reversi.legal_moves()):
+            reversi.move(row, col, safety_check=False)
+            walk(ply + 1)
+            reversi.undo_move()
+
+    walk(0)
+    return positions
+
+
+def search_entry(task):
+    """ Pool task: search one position for the book.
+
+    Input:
+        task: Tuple object (chessMap, currentState, depth).
+    Output:
+        Tuple object ((own, oppo), square, score).
+    """
+    (chessMap, current_state, depth) = task
+    reversi = BitboardReversi(chessMap, current_state)
+    ai = ReversiAI(reversi, depth, workers=1, verbose=False,
+                   endgame_empties=0)
+    (pos_row, pos_col) = ai.think()
+    return (position_bits(reversi), pos_row * n + pos_col,
+            ai.get_last_score())
+
+
+def search_entries(plies, depth, processes=None):
+    """ Book entries from searching every position of the first plies.
+    """
+    tasks = [(chessMap, current_state, depth)
+             for (chessMap, current_state) in opening_positions(plies)]
+    if processes == 1:
+        return [search_entry(task) for task in tasks]
+    pool = Pool(processes)
+    try:
+        return pool.map(search_entry, tasks, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def log_entries(paths, plies):
+    """ Book entries from selfplay.py logs. For every position of the
+    first plies, the move with the best mean final disc differential
+    for the player to move is kept.
+    """
+    results = {}
+    for path in paths:
+        with open(path) as log:
+            for line in log:
+                game = json.loads(line)
+                reversi = BitboardReversi()
+                for (pos_row, pos_col) in game['moves'][:plies]:
+                    (own, oppo) = position_bits(reversi)
+                    if reversi.get_current_state() == BoardState.Black:
+                        outcome = game['black'] - game['white']
+                    else:
+                        outcome = game['white'] - game['black']
+                    (own, oppo, sym) = canonical_bits(own, oppo)
+                    square = symmetry_squares[sym][pos_row * n + pos_col]
+                    total = results.setdefault((own, oppo), {}).setdefault(
+                        square, [0, 0])
+                    total[0] += outcome
+                    total[1] += 1
+                    reversi.move(pos_row, pos_col, safety_check=True)
+
+    entries = []
+    for (position, moves) in results.items():
+        (square, (outcome, count)) = max(
+            moves.items(), key=lambda item: item[1][0] / item[1][1])
+        entries.append((position, square, round(outcome / count)))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build the opening book of ReversiAI.')
+    parser.add_argument('--plies', type=int, default=6,
+                        help='number of plies from the initial position')
+    parser.add_argument('--depth', type=int, default=4,
+                        help='search depth for positions without --log')
+    parser.add_argument('--log', nargs='+', default=None,
+                        help='selfplay.py JSON lines files to learn from')
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    parser.add_argument('-o', '--output', default=Opening_Book_Path)
+    args = parser.parse_args(argv)
+
+    if args.log is None:
+        entries = search_entries(args.plies, args.depth, args.processes)
+    else:
+        entries = log_entries(args.log, args.plies)
+    count = write_book(args.output, entries)
+    print('Wrote', count, 'positions to', args.output)
+
+
+if __name__ == '__main__':
+    main()
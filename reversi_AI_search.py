@@ -3,12 +3,307 @@
 Contains the ReversiAI class.
 """
 
-from enum import Enum
-from random import random
-from copy import deepcopy
+from time import time
+from multiprocessing import Pool
 
 from const import *
-from core import *
+from core import transform_move, inverse_symmetry
+from bitboard import move_mask, flip_mask, popcount, full_mask
+
+__all__ = ['ReversiAI', 'SearchStats', 'SearchTimeout', 'SearchCancelled',
+           'TranspositionTable', 'EndgameSolver']
+
+""" Bound types of a transposition table entry. """
+tt_exact = 0
+tt_lower = 1
+tt_upper = 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget is used up."""
+    pass
+
+
+class SearchCancelled(Exception):
+    """Raised out of ReversiAI.think() when the search is cancelled."""
+    pass
+
+
+class TranspositionTable(object):
+    """Fixed-size transposition table indexed by Zobrist hash.
+
+    The search keys it on the canonical hash of a position and stores
+    best moves in the canonical orientation, so the 8 symmetric images
+    of a position share one entry.
+
+    Each slot holds one entry (key, depth, bound, score, best move,
+    generation). A slot is replaced when it is empty, was written by an
+    earlier search, or holds a result searched no deeper than the new
+    one, so deep results survive within a search while stale ones are
+    recycled across turns.
+
+    Attributes:
+        __entries: List object. the slots of the table.
+        __mask: int. size - 1, maps a key onto a slot.
+        __generation: int. the number of the current search.
+    """
+    def __init__(self, size=AI_TT_Size):
+        if size & (size - 1):
+            raise ValueError('Table size must be a power of 2')
+        self.__entries = [None] * size
+        self.__mask = size - 1
+        self.__generation = 0
+
+    def new_search(self):
+        """Mark the entries written so far as replaceable."""
+        self.__generation += 1
+
+    def clear(self):
+        """Remove every entry."""
+        self.__entries = [None] * len(self.__entries)
+
+    def probe(self, key):
+        """Look up a position.
+
+        Output:
+            Tuple object (key, depth, bound, score, best move,
+        generation), or None when the position is not stored.
+        """
+        entry = self.__entries[key & self.__mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, best_move):
+        """Store a search result, following the replacement policy.
+
+        Input:
+            key: Int object, the Zobrist hash of the position.
+            depth: Int object, the remaining depth searched.
+            bound: tt_exact, tt_lower or tt_upper.
+            score: Int object, the score of the position.
+            best_move: Tuple object (row, col) or None.
+        """
+        slot = key & self.__mask
+        old = self.__entries[slot]
+        if old is None or old[5] != self.__generation or depth >= old[1]:
+            self.__entries[slot] = (key, depth, bound, score, best_move,
+                                    self.__generation)
+
+
+""" The four 4x4 quadrants of the board, for the parity ordering of the
+endgame solver.
+"""
+quadrant_masks = []
+for top in (0, n // 2):
+    for left in (0, n // 2):
+        mask = 0
+        for row in range(top, top + n // 2):
+            for col in range(left, left + n // 2):
+                mask |= 1 << (row * n + col)
+        quadrant_masks.append(mask)
+
+
+class EndgameSolver(object):
+    """Exact solver for positions with few empty squares.
+
+    Searches to the end of the game on bitboards with negamax
+    alpha-beta, scoring the final disc differential. Moves are ordered
+    fastest-first (least opponent mobility) while many squares are
+    empty, and by parity (odd quadrants first) near the end; the last
+    empty square is resolved directly.
+
+    Attributes:
+        nodes: int. The number of nodes visited.
+        __deadline: float. The time at which the solver gives up by
+    raising SearchTimeout, None for no limit.
+        __cancel: Event object. Makes the solver raise SearchCancelled
+    once set, None when the solve cannot be cancelled.
+    """
+
+    """ Up to this many empties, moves are ordered by parity only. """
+    parity_empties = 6
+
+    def __init__(self, deadline=None, cancel=None):
+        self.nodes = 0
+        self.__deadline = deadline
+        self.__cancel = cancel
+
+    def solve(self, own, oppo):
+        """ Find the best move of the player owning `own`.
+
+        Output:
+            Tuple object (row, col, disc differential), the move being
+        None when the player has to pass.
+        """
+        best_square = None
+        alpha = -n_squared - 1
+        for (bit, flips) in self.__order(own, oppo):
+            score = -self.__search(oppo & ~flips, own | bit | flips,
+                                   -n_squared - 1, -alpha)
+            if score > alpha:
+                alpha = score
+                best_square = bit.bit_length() - 1
+
+        if best_square is None:
+            return (None, None, self.__search(own, oppo, -n_squared - 1,
+                                              n_squared + 1))
+        return (best_square // n, best_square % n, alpha)
+
+    def __order(self, own, oppo):
+        """ Returns the (move bit, flipped bits) pairs, best first. """
+        empty = ~(own | oppo) & full_mask
+        moves = move_mask(own, oppo)
+        children = []
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            children.append((bit, flip_mask(bit, own, oppo)))
+
+        if popcount(empty) <= self.parity_empties:
+            odd = 0
+            for mask in quadrant_masks:
+                if popcount(empty & mask) & 1:
+                    odd |= mask
+            children.sort(key=lambda child: not child[0] & odd)
+        else:
+            children.sort(key=lambda child: popcount(move_mask(
+                oppo & ~child[1], own | child[0] | child[1])))
+        return children
+
+    def __search(self, own, oppo, alpha, beta):
+        """ Negamax alpha-beta to the end of the game.
+
+        Output:
+            Int object, the final disc differential for `own`.
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            if self.__cancel is not None and self.__cancel.is_set():
+                raise SearchCancelled()
+            if self.__deadline is not None and time() > self.__deadline:
+                raise SearchTimeout()
+
+        empty = ~(own | oppo) & full_mask
+        if empty and not empty & (empty - 1):
+            return self.__last_empty(own, oppo, empty)
+
+        children = self.__order(own, oppo)
+        if not children:
+            if not move_mask(oppo, own):
+                return popcount(own) - popcount(oppo)
+            return -self.__search(oppo, own, -beta, -alpha)
+
+        best = -n_squared - 1
+        for (bit, flips) in children:
+            score = -self.__search(oppo & ~flips, own | bit | flips,
+                                   -beta, -alpha)
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def __last_empty(self, own, oppo, bit):
+        """ Final disc differential when only `bit` is empty. """
+        self.nodes += 1
+        flips = flip_mask(bit, own, oppo)
+        if flips:
+            return popcount(own) - popcount(oppo) + 2 * popcount(flips) + 1
+        flips = flip_mask(bit, oppo, own)
+        if flips:
+            return popcount(own) - popcount(oppo) - 2 * popcount(flips) - 1
+        return popcount(own) - popcount(oppo)
+
+
+class SearchStats(object):
+    """SearchStats object that describes one think() of ReversiAI.
+
+    nodes includes the nodes searched by the worker processes of a
+    parallel search; the other counters cover this process only.
+
+    Attributes:
+        source: str. 'book', 'endgame' or 'search', where the move
+    came from, or 'ponder' when think() answered with a move found by
+    ponder(); the other fields then describe that search.
+        move: Tuple object. The chosen (row, col).
+        score: int. The score of the move, None for a book move.
+        depth: int. The deepest completed search depth, None for book
+    and endgame moves.
+        nodes: int. The number of nodes visited.
+        endgame_nodes: int. The part of nodes visited by EndgameSolver.
+        roots: int. The number of searches started from the root, one
+    per iteration plus aspiration re-searches.
+        leaf_evaluations: int. The number of positions scored by
+    ReversiAI.evaluate().
+        expanded: int. The number of nodes whose moves were searched.
+        tt_hits: int. The number of transposition table probes that
+    found an entry.
+        tt_cutoffs: int. The number of nodes answered by the table
+    without searching.
+        cutoffs: List object. The number of cutoffs at each ply.
+        depth_times: List object of (depth, seconds, nodes) tuples, one
+    per completed iteration, the time and nodes being counted from the
+    start of the search.
+        principal_variation: List object of (row, col) tuples, the
+    expected line of play from the chosen move.
+        time: float. The wall time of think() in seconds.
+    """
+    def __init__(self):
+        self.source = None
+        self.move = None
+        self.score = None
+        self.depth = None
+        self.nodes = 0
+        self.endgame_nodes = 0
+        self.roots = 0
+        self.leaf_evaluations = 0
+        self.expanded = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.cutoffs = []
+        self.depth_times = []
+        self.principal_variation = []
+        self.time = 0.0
+
+    def branching_factor(self):
+        """ Get the average number of moves searched per expanded node.
+
+        Output:
+            Float object.
+        """
+        if self.expanded == 0:
+            return 0.0
+        return (self.nodes - self.endgame_nodes - self.roots) / \
+            self.expanded
+
+    def to_dict(self):
+        """ Get the statistics as a dict of plain values, for JSON and
+        metrics exporters.
+
+        Output:
+            Dict object.
+        """
+        return {
+            'source': self.source,
+            'move': self.move,
+            'score': self.score,
+            'depth': self.depth,
+            'nodes': self.nodes,
+            'endgame_nodes': self.endgame_nodes,
+            'leaf_evaluations': self.leaf_evaluations,
+            'expanded': self.expanded,
+            'tt_hits': self.tt_hits,
+            'tt_cutoffs': self.tt_cutoffs,
+            'cutoffs': list(self.cutoffs),
+            'branching_factor': round(self.branching_factor(), 3),
+            'depth_times': [list(entry) for entry in self.depth_times],
+            'principal_variation': [list(move)
+                                    for move in self.principal_variation],
+            'time': self.time
+        }
 
 
 class ReversiAI(object):
@@ -19,29 +314,144 @@ class ReversiAI(object):
         depth: int. The search depth of DFS.
         __currentState: BoardState object. The piece state of this AI.
         __opponentState: BoardState object. The piece state of this AI.
+        __table: TranspositionTable object. Kept across think() calls
+    of the same game.
+        __max_depth: int. The depth limit of the running search.
+        __root_move: Tuple object. The best move of the previous
+    iteration, searched first at the root.
+        __root_hash: int. The hash of the root scored last by
+    score_move(), to start a new table generation per root.
+        __deadline: float. The time at which the running search stops,
+    None for no limit.
+        __stats: SearchStats object. The statistics of the running or
+    last think().
+        __listeners: List object. The callbacks registered by
+    subscribe().
+        __cancel: Event object. The cancel event of the running
+    think(), None when it cannot be cancelled.
+        __pondering: bool. Whether the running search is a speculative
+    one of ponder(), which neither prints nor sends events.
+        __pondered: Dict object. The SearchStats of the answers found
+    by ponder(), keyed by the hash of the position they answer.
+        __killers: List object. For every ply of the running search,
+    the last (up to 2) moves that caused a cutoff there.
+        __history_table: List object. For every color, the cutoff
+    bonus collected by each square = row * n + col during the game.
+        workers: int. The number of processes searching the root moves
+    in parallel; 1 searches in this process.
+        __pool: Pool object. The worker processes, created on first
+    use.
+        verbose: bool. Whether think() prints the chosen move.
+        algorithm: str. 'alphabeta' or 'pvs', see AI_Search_Algorithm.
+        endgame_empties: int. The number of empty squares from which
+    the game is solved exactly by EndgameSolver.
+        book: OpeningBook object. Consulted before searching, None to
+    always search.
+        __score: int. The score of the move chosen by the last think(),
+    None when it came from the book.
     """
 
     """
-    The weight matrix is set according to position importance. The
-    point on the edge are more crucial to take compared to the point
-    in the middle, and the four positions on the corner are even more
-    substantial: The pieces placed at the corner couldn't be flipped,
-    and the pieces placed on the edge could only be flipped with other
-    pieces on the same edge.
+    The weight matrix is defined in const.py. Both board engines keep
+    the weighted piece sum up to date in move(), so evaluation does not
+    need to visit the squares.
     """
-    weight_matrix = [[16, 4, 4, 4, 4, 4, 4, 16],
-                     [4, 1, 1, 1, 1, 1, 1, 4],
-                     [4, 1, 1, 1, 1, 1, 1, 4],
-                     [4, 1, 1, 1, 1, 1, 1, 4],
-                     [4, 1, 1, 1, 1, 1, 1, 4],
-                     [4, 1, 1, 1, 1, 1, 1, 4],
-                     [4, 1, 1, 1, 1, 1, 1, 4],
-                     [16, 4, 4, 4, 4, 4, 4, 16]]
-    def __init__(self, reversi, depth):
+    weight_matrix = weight_matrix
+
+    algorithms = ('alphabeta', 'pvs')
+
+    """ Shallower searches are not worth the round trip to the worker
+    processes and are run serially.
+    """
+    parallel_depth = 3
+
+    def __init__(self, reversi, depth, workers=AI_Workers, verbose=True,
+                 endgame_empties=AI_Endgame_Empties, book=None,
+                 algorithm=AI_Search_Algorithm):
+        if algorithm not in self.algorithms:
+            raise ValueError('Unknown search algorithm: ' + str(algorithm))
         self.__reversi = reversi
+        self.algorithm = algorithm
+        self.book = book
         self.depth = depth
+        self.endgame_empties = endgame_empties
+        self.workers = workers
+        self.verbose = verbose
+        self.__pool = None
         self.__currentState = None
         self.__opponentState = None
+        self.__table = TranspositionTable()
+        self.__max_depth = depth
+        self.__root_move = None
+        self.__root_hash = None
+        self.__deadline = None
+        self.__stats = SearchStats()
+        self.__listeners = []
+        self.__cancel = None
+        self.__pondering = False
+        self.__pondered = {}
+        self.__killers = []
+        self.__history_table = [[0] * n_squared for state in BoardState]
+        self.__score = None
+
+    def new_game(self):
+        """Forget the positions and move statistics stored during the
+        previous game.
+        """
+        self.__table.clear()
+        self.__history_table = [[0] * n_squared for state in BoardState]
+
+    def get_node_count(self):
+        """ Get the number of nodes visited by the last think().
+
+        Output:
+            Int object.
+        """
+        return self.__stats.nodes
+
+    def get_last_stats(self):
+        """ Get the statistics of the last think().
+
+        Output:
+            SearchStats object.
+        """
+        return self.__stats
+
+    def subscribe(self, callback):
+        """ Register callback(event, stats) for the search events:
+        'iteration' after every completed depth, and 'done' when
+        think() has chosen a move. stats is the SearchStats object of
+        the running think(). Without subscribers no event is built.
+        """
+        self.__listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered by subscribe()."""
+        self.__listeners.remove(callback)
+
+    def __notify(self, event):
+        """ Call the subscribed callbacks with the current stats,
+        unless the search is a speculative one of ponder().
+        """
+        if self.__pondering:
+            return
+        for listener in self.__listeners:
+            listener(event, self.__stats)
+
+    def get_last_score(self):
+        """ Get the score of the move chosen by the last think().
+
+        Output:
+            Int object, relative to this AI, or None for a book move.
+        """
+        return self.__score
+
+    def close(self):
+        """Shut down the worker processes of the parallel search."""
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
 
     def evaluate(self, condition):
         """ The evaluate function.
@@ -50,19 +460,58 @@ class ReversiAI(object):
         (self as 1, opponent as -1) multiplied by the weight
         matrix value.
         """
-        self_state = self.__currentState
-        oppo_state = self.__opponentState
-        score = 0
+        score = condition.get_weight_score()
+        if self.__currentState == BoardState.Black:
+            return score
+        return -score
 
-        for row in range(n):
-            for col in range(n):
-                cur_piece = condition.get_position_state(row, col)
-                if cur_piece == self_state:
-                    score += self.weight_matrix[row][col]
-                elif cur_piece == oppo_state:
-                    score -= self.weight_matrix[row][col]
+    def __order_moves(self, condition, depth, first_move=None):
+        """ Gather possible moves within an array, best first, without
+        making any of them: first_move, then the killer moves of the
+        ply, then by history bonus, and by weight_matrix on ties.
 
-        return score
+        Input:
+            condition: Reversi object.
+            depth: Int object, the ply of condition in the search.
+            first_move: Tuple object (row, col) searched before the
+        others, usually the stored best move.
+        Output:
+            List object of (row, col) tuples.
+        """
+        if depth < len(self.__killers):
+            killers = self.__killers[depth]
+        else:
+            killers = ()
+        history = self.__history_table[condition.get_current_state().value]
+
+        branch = [(row, col) for (row, col, flipped)
+                  in condition.legal_moves()]
+        branch.sort(key=lambda move: (
+            move != first_move,
+            move not in killers,
+            -history[move[0] * n + move[1]],
+            -self.weight_matrix[move[0]][move[1]]))
+        return branch
+
+    def __record_cutoff(self, condition, depth, move, remaining):
+        """ Remember a move that caused a cutoff: as a killer move of
+        its ply, and in the history table with a bonus growing with
+        the depth of the cut subtree.
+        """
+        cutoffs = self.__stats.cutoffs
+        while len(cutoffs) <= depth:
+            cutoffs.append(0)
+        cutoffs[depth] += 1
+
+        while len(self.__killers) <= depth:
+            self.__killers.append([])
+        killers = self.__killers[depth]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+        history = self.__history_table[condition.get_current_state().value]
+        history[move[0] * n + move[1]] += remaining * remaining
 
     def alphabeta(self, condition, depth, alpha, beta):
         """ Alpha Beta Pruning based DFS.
@@ -74,31 +523,54 @@ class ReversiAI(object):
         the worse achievable result as beta, and filter out all moves
         that is smaller than alpha on our turn or moves that is larger
         than beta on our opponent's turn.
+
+        With the 'pvs' algorithm, every move after the first is only
+        tested against the best score so far with a null window, and
+        searched again with the full window when the test shows that
+        it is better.
         """
 
         """ Returns the evaluation result when reaches maximum depth,
         or inf/-inf when a player wins.
         """
 
-        if depth > self.depth:
-            return (None, None, self.evaluate(condition))
-
-        """ Gather possible moves within an array. """
-
-        branch = []
-        new_condition = deepcopy(condition)
+        stats = self.__stats
+        stats.nodes += 1
+        if stats.nodes & 63 == 0:
+            if self.__cancel is not None and self.__cancel.is_set():
+                raise SearchCancelled()
+            if self.__deadline is not None and time() > self.__deadline:
+                raise SearchTimeout()
 
-        for row in range(n):
-            for col in range(n):
-                try:
-                    new_condition.move(row, col, safety_check=True)
-                    branch.append(
-                        (self.evaluate(new_condition), row, col, new_condition))
+        if depth > self.__max_depth:
+            stats.leaf_evaluations += 1
+            return (None, None, self.evaluate(condition))
 
-                    new_condition = deepcopy(condition)
+        """ Reuse the stored result of a transposition searched at
+        least as deep, and try its best move first otherwise. The root
+        is always searched so that a move is returned.
+        """
+        remaining = self.__max_depth + 1 - depth
+        (key, sym) = condition.get_canonical_hash()
+        entry = self.__table.probe(key)
+        tt_move = None
+        if entry is not None:
+            stats.tt_hits += 1
+            (_, entry_depth, bound, score, tt_move, _) = entry
+            if tt_move is not None:
+                tt_move = transform_move(tt_move, inverse_symmetry[sym])
+            if depth > 0 and entry_depth >= remaining:
+                if bound == tt_exact or \
+                   (bound == tt_lower and score >= beta) or \
+                   (bound == tt_upper and score <= alpha):
+                    stats.tt_cutoffs += 1
+                    return (None, None, score)
+        if depth == 0:
+            stats.roots += 1
+            if self.__root_move is not None:
+                tt_move = self.__root_move
 
-                except BaseException:
-                    pass
+        branch = self.__order_moves(condition, depth, tt_move)
 
         """ Check winning status here to prevent redundant
         condition checks.
@@ -113,46 +585,547 @@ class ReversiAI(object):
             else:
                 return (None, None, 0)
 
+        stats.expanded += 1
+        alpha_orig = alpha
+        beta_orig = beta
         best_row = None
         best_col = None
+        null_window = self.algorithm == 'pvs'
 
         if condition.get_current_state() == self.__currentState:
             """ Our turn """
-            branch.sort(key=lambda element: -element[0])
             for child in branch:
-                _, _, child_score = self.alphabeta(
-                    child[3], depth + 1, alpha, beta)
+                condition.move(child[0], child[1], safety_check=False)
+                try:
+                    if null_window and child is not branch[0]:
+                        _, _, child_score = self.alphabeta(
+                            condition, depth + 1, alpha, alpha + 1)
+                        if alpha < child_score < beta:
+                            _, _, child_score = self.alphabeta(
+                                condition, depth + 1, alpha, beta)
+                    else:
+                        _, _, child_score = self.alphabeta(
+                            condition, depth + 1, alpha, beta)
+                finally:
+                    """ Take the move back even when the search is
+                    stopped, so the root position stays intact.
+                    """
+                    condition.undo_move()
                 if child_score > alpha:
                     alpha = child_score
+                    (best_row, best_col) = child
                     if beta <= alpha:
+                        self.__record_cutoff(
+                            condition, depth, child, remaining)
                         break
-                    best_row = child[1]
-                    best_col = child[2]
 
-            return (best_row, best_col, alpha)
+            score = alpha
         else:
             """ Our opponent's turn """
-            branch.sort(key=lambda element: -element[0])
             for child in branch:
-                _, _, child_score = self.alphabeta(
-                    child[3], depth + 1, alpha, beta)
+                condition.move(child[0], child[1], safety_check=False)
+                try:
+                    if null_window and child is not branch[0]:
+                        _, _, child_score = self.alphabeta(
+                            condition, depth + 1, beta - 1, beta)
+                        if alpha < child_score < beta:
+                            _, _, child_score = self.alphabeta(
+                                condition, depth + 1, alpha, beta)
+                    else:
+                        _, _, child_score = self.alphabeta(
+                            condition, depth + 1, alpha, beta)
+                finally:
+                    condition.undo_move()
                 if child_score < beta:
                     beta = child_score
+                    (best_row, best_col) = child
                     if beta <= alpha:
+                        self.__record_cutoff(
+                            condition, depth, child, remaining)
                         break
-                    best_row = child[1]
-                    best_col = child[2]
 
-            return (best_row, best_col, beta)
+            score = beta
 
-    def think(self):
-        """ The main mathod for decision making."""
-        self.__currentState = self.__reversi.get_current_state()
-        self.__opponentState = self.__reversi.get_opponent_state()
+        if score <= alpha_orig:
+            bound = tt_upper
+        elif score >= beta_orig:
+            bound = tt_lower
+        else:
+            bound = tt_exact
+        if best_row is None:
+            best_move = tt_move
+        else:
+            best_move = (best_row, best_col)
+        if best_move is not None:
+            best_move = transform_move(best_move, sym)
+        self.__table.store(key, remaining, bound, score, best_move)
+
+        return (best_row, best_col, score)
 
-        best_row, best_col, score = self.alphabeta(
-            self.__reversi, 0, -inf, inf)
+    def think(self, time_limit=None, cancel=None):
+        """ The main mathod for decision making.
+
+        Input:
+            time_limit: Float object, the time budget in seconds. When
+        given, the search deepens iteratively (depth 0, 1, 2, ...) and
+        the best move of the deepest completed iteration is returned;
+        otherwise a single search to self.depth is run.
+            cancel: threading.Event object. When it is set, from any
+        thread, the search stops and SearchCancelled is raised. A
+        parallel search notices it once its root moves are done.
+        Output:
+            Tuple object (row, col) of the chosen move.
+        """
+        self.__cancel = cancel
+        self.__killers = []
+        """ Age the history table once per move, so that the statistics
+        of the current phase of the game dominate. The searches of
+        ponder() leave it alone.
+        """
+        for history in self.__history_table:
+            for square in range(n_squared):
+                history[square] >>= 1
 
-        print('AI   :', (best_row, best_col), 'Evaluation Score:', score)
+        pondered = self.__pondered.get(self.__reversi.get_hash())
+        self.__pondered = {}
+        if pondered is not None and pondered.move in [
+                (row, col) for (row, col, flipped)
+                in self.__reversi.legal_moves()]:
+            if self.verbose:
+                print('AI   :', pondered.move, 'Evaluation Score:',
+                      pondered.score, 'Pondered')
+            pondered.source = 'ponder'
+            self.__stats = pondered
+            self.__score = pondered.score
+            self.__notify('done')
+            return pondered.move
+
+        return self.__choose(self.__reversi, time_limit)
+
+    def ponder(self, condition, time_limit=None, cancel=None):
+        """ Search on the opponent's time.
+
+        Every reply of the opponent is searched in turn, the expected
+        one first, and the move think() would choose after it is kept.
+        When the opponent then plays one of the answered replies,
+        think() returns at once; otherwise it still profits from the
+        filled transposition table.
+
+        Input:
+            condition: Reversi object, the position with the opponent
+        to move. It is not modified.
+            time_limit: Float object, the time budget of each answer,
+        the same as given to think().
+            cancel: threading.Event object, set when the opponent has
+        moved; pondering stops within a few nodes.
+        Output:
+            Int object, the number of replies answered.
+        """
+        self.__cancel = cancel
+        self.__pondered = {}
+        root = condition.copy()
+        replies = [(row, col) for (row, col, flipped) in root.legal_moves()]
+        expected = self.__stats.principal_variation[1:2]
+        replies.sort(key=lambda move: move not in expected)
 
+        """ The speculative searches must not show through: the stats
+        and score of the last think() are restored afterwards.
+        """
+        (stats, score) = (self.__stats, self.__score)
+        self.__pondering = True
+        try:
+            for (row, col) in replies:
+                if cancel is not None and cancel.is_set():
+                    break
+                board = root.copy()
+                board.move(row, col, safety_check=False)
+                if board.check_winning_status()[0] or \
+                   board.get_current_state() == root.get_current_state():
+                    continue
+                try:
+                    self.__choose(board, time_limit)
+                except SearchCancelled:
+                    break
+                self.__pondered[board.get_hash()] = self.__stats
+        finally:
+            self.__pondering = False
+            (self.__stats, self.__score) = (stats, score)
+
+        return len(self.__pondered)
+
+    def __choose(self, reversi, time_limit):
+        """ Choose the move of the player to move on reversi, from the
+        book or by searching.
+
+        Input:
+            reversi: Reversi object, not modified.
+            time_limit: Float object, see think().
+        Output:
+            Tuple object (row, col) of the chosen move.
+        """
+        report = self.verbose and not self.__pondering
+        self_state = reversi.get_current_state()
+        if self.__currentState not in (None, self_state):
+            """ Stored scores are relative to the color of this AI. """
+            self.__table.clear()
+        self.__currentState = self_state
+        self.__opponentState = reversi.get_opponent_state()
+        self.__table.new_search()
+        self.__stats = SearchStats()
+        start = time()
+        self.__root_move = None
+        self.__deadline = None
+        self.__score = None
+
+        if self.book is not None:
+            book_move = self.book.lookup(reversi)
+            if book_move is not None:
+                if report:
+                    print('AI   :', book_move, 'Opening Book')
+                self.__finish('book', book_move, None, None, start)
+                return book_move
+
+        """ Search on a private copy so that the displayed board is
+        never touched by the make/unmake moves of the search.
+        """
+        condition = reversi.copy()
+        if time_limit is None:
+            deadline = None
+        else:
+            deadline = time() + time_limit
+
+        solved = None
+        empties = n_squared - condition.get_tot_chess_count()
+        if empties <= self.endgame_empties:
+            solved = self.__solve_endgame(condition, deadline)
+
+        if solved is not None:
+            (best_row, best_col, score) = solved
+            completed = 'exact'
+        elif time_limit is None and self.algorithm != 'pvs':
+            self.__max_depth = self.depth
+            best_row, best_col, score = self.__search_root(condition)
+            completed = self.depth
+            self.__stats.depth_times.append(
+                (completed, time() - start, self.__stats.nodes))
+            self.__notify('iteration')
+        else:
+            """ The null windows of 'pvs' pay off on well ordered
+            trees, so it deepens up to self.depth even without a time
+            limit, to fill the table and the aspiration guess.
+            """
+            (best_row, best_col, score, completed) = self.__deepen(
+                condition, deadline)
+
+        if report:
+            print('AI   :', (best_row, best_col), 'Evaluation Score:', score,
+                  'Depth:', completed)
+
+        self.__score = score
+        if solved is not None:
+            self.__finish('endgame', (best_row, best_col), score, None,
+                          start)
+        else:
+            self.__stats.principal_variation = \
+                self.__principal_variation(condition, (best_row, best_col),
+                                           completed + 1)
+            self.__finish('search', (best_row, best_col), score,
+                          completed, start)
         return best_row, best_col
+
+    def __finish(self, source, move, score, depth, start):
+        """Complete the stats of think() and send the 'done' event."""
+        stats = self.__stats
+        stats.source = source
+        stats.move = move
+        stats.score = score
+        stats.depth = depth
+        stats.time = time() - start
+        if source != 'search':
+            stats.principal_variation = [move]
+        self.__notify('done')
+
+    def __principal_variation(self, condition, move, length):
+        """ Follow the stored best moves from the root.
+
+        Input:
+            condition: Reversi object, the root position.
+            move: Tuple object (row, col), the chosen move.
+            length: Int object, the maximum number of moves.
+        Output:
+            List object of (row, col) tuples.
+        """
+        line = []
+        while move is not None and len(line) < length:
+            if move not in [(row, col) for (row, col, flipped)
+                            in condition.legal_moves()]:
+                break
+            condition.move(move[0], move[1], safety_check=False)
+            line.append(move)
+
+            (key, sym) = condition.get_canonical_hash()
+            entry = self.__table.probe(key)
+            move = None
+            if entry is not None and entry[4] is not None:
+                move = transform_move(entry[4], inverse_symmetry[sym])
+        for played in line:
+            condition.undo_move()
+        return line
+
+    def __solve_endgame(self, condition, deadline):
+        """ Solve the position exactly with EndgameSolver.
+
+        Output:
+            Tuple object (row, col, score), the score being winning
+        plus the final disc differential for a win (minus for a loss),
+        or None when the deadline passed first.
+        """
+        (black, white) = condition.get_bitboards()
+        if self.__currentState == BoardState.Black:
+            (own, oppo) = (black, white)
+        else:
+            (own, oppo) = (white, black)
+
+        solver = EndgameSolver(deadline, self.__cancel)
+        try:
+            (best_row, best_col, disc_difference) = solver.solve(own, oppo)
+        except SearchTimeout:
+            return None
+        finally:
+            self.__stats.nodes += solver.nodes
+            self.__stats.endgame_nodes = solver.nodes
+
+        if disc_difference > 0:
+            return (best_row, best_col, winning + disc_difference)
+        elif disc_difference < 0:
+            return (best_row, best_col, -winning + disc_difference)
+        return (best_row, best_col, 0)
+
+    def __deepen(self, condition, deadline):
+        """ Iterative deepening until the deadline.
+
+        The first iteration always completes, so a move is available
+        however small the budget is. Deeper iterations start from the
+        previous best move, and from a window around the previous score
+        with the 'pvs' algorithm, and are abandoned when time runs out.
+
+        Input:
+            condition: Reversi object, the root position.
+            deadline: Float object, None to deepen up to self.depth.
+        Output:
+            Tuple object (row, col, score, depth) of the deepest
+        completed iteration.
+        """
+        """ At the depth of the empty squares every line reaches the
+        end of the game, so deeper iterations cannot change the score.
+        """
+        last_depth = n_squared - condition.get_tot_chess_count()
+        if deadline is None:
+            last_depth = min(last_depth, self.depth)
+        result = None
+        depth = 0
+        start = time()
+
+        while depth <= last_depth:
+            self.__max_depth = depth
+            if result is None:
+                guess = None
+            else:
+                guess = result[2]
+            try:
+                (best_row, best_col, score) = self.__search_root(
+                    condition, guess)
+            except SearchTimeout:
+                break
+            result = (best_row, best_col, score, depth)
+            self.__root_move = (best_row, best_col)
+            self.__stats.depth_times.append(
+                (depth, time() - start, self.__stats.nodes))
+            self.__notify('iteration')
+            self.__deadline = deadline
+
+            if deadline is not None and time() > deadline:
+                break
+            depth += 1
+
+        self.__deadline = None
+        return result
+
+    def __search_root(self, condition, guess=None):
+        """ Search the root position to self.__max_depth, in this
+        process or across the worker processes.
+
+        Input:
+            condition: Reversi object, the root position.
+            guess: Int object, the expected score. The 'pvs' algorithm
+        searches a window of AI_Aspiration_Window around it first.
+        Output:
+            Tuple object (row, col, score).
+        """
+        if self.workers <= 1 or self.__max_depth < self.parallel_depth:
+            if guess is None or self.algorithm != 'pvs':
+                return self.alphabeta(condition, 0, -inf, inf)
+
+            alpha = guess - AI_Aspiration_Window
+            beta = guess + AI_Aspiration_Window
+            result = self.alphabeta(condition, 0, alpha, beta)
+            if alpha < result[2] < beta:
+                return result
+            """ The score fell outside the window, which only bounds
+            it: search again with the full window.
+            """
+            return self.alphabeta(condition, 0, -inf, inf)
+
+        """ Young brothers wait: the first root move is searched here
+        with a full window, then the others by the workers with a null
+        window at its score, which only proves them no better. The
+        moves that fail high are searched again here, in root order,
+        above the best score so far, and the rest of them are tested
+        again against every new best score. The best score is thus
+        exact and matches the serial search. Among equal scores the
+        first move in root order wins; the killer and history
+        statistics of the workers are not shared, so that order can
+        differ from the serial search.
+        """
+        (key, sym) = condition.get_canonical_hash()
+        entry = self.__table.probe(key)
+        first_move = self.__root_move
+        if first_move is None and entry is not None and \
+           entry[4] is not None:
+            first_move = transform_move(entry[4], inverse_symmetry[sym])
+        branch = self.__order_moves(condition, 0, first_move)
+
+        self.__stats.roots += 1
+        (best_row, best_col) = branch[0]
+        best_score = None
+        if guess is not None and self.algorithm == 'pvs':
+            alpha = guess - AI_Aspiration_Window
+            beta = guess + AI_Aspiration_Window
+            best_score = self.__score_root_move(condition, branch[0],
+                                                alpha, beta)
+            if not alpha < best_score < beta:
+                best_score = None
+        if best_score is None:
+            best_score = self.__score_root_move(condition, branch[0],
+                                                -inf, inf)
+        siblings = branch[1:]
+
+        while siblings:
+            scores = self.__score_moves(condition, siblings, best_score,
+                                        best_score + 1)
+            siblings = [move for (move, score) in zip(siblings, scores)
+                        if score > best_score]
+            if not siblings:
+                break
+            move = siblings.pop(0)
+            score = self.__score_root_move(condition, move, best_score, inf)
+            if score > best_score:
+                (best_row, best_col, best_score) = (move[0], move[1], score)
+        return (best_row, best_col, best_score)
+
+    def __score_root_move(self, condition, move, alpha, beta):
+        """ Score one root move in this process.
+
+        Output:
+            Int object, the score of the move within the window.
+        """
+        condition.move(move[0], move[1], safety_check=False)
+        try:
+            (_, _, score) = self.alphabeta(condition, 1, alpha, beta)
+        finally:
+            condition.undo_move()
+        return score
+
+    def __score_moves(self, condition, moves, alpha, beta):
+        """ Score root moves in the worker processes.
+
+        Input:
+            condition: Reversi object, the root position.
+            moves: List object of (row, col) root moves.
+            alpha, beta: Int objects, the window of every search.
+        Output:
+            List object of the scores, in the order of moves.
+        """
+        if not moves:
+            return []
+        tasks = [(condition, row, col, self.__max_depth, self.__deadline,
+                  self.algorithm, alpha, beta) for (row, col) in moves]
+        if self.__pool is None:
+            self.__pool = Pool(self.workers)
+        results = self.__pool.map(search_root_move, tasks, chunksize=1)
+        for (score, nodes) in results:
+            self.__stats.nodes += nodes
+        if self.__cancel is not None and self.__cancel.is_set():
+            raise SearchCancelled()
+        scores = [score for (score, nodes) in results]
+        if None in scores:
+            raise SearchTimeout()
+        return scores
+
+    def score_move(self, condition, row, col, max_depth, deadline=None,
+                   alpha=-inf, beta=inf):
+        """ Score one root move. Runs in the worker processes of the
+        parallel search.
+
+        Input:
+            condition: Reversi object, the root position.
+            row, col: Position of the root move.
+            max_depth: Int object, the depth limit of the search.
+            deadline: Float object, the time at which to give up.
+            alpha, beta: Int objects, the search window.
+        Output:
+            Tuple object (score, nodes): the score of the move, exact
+        within the window and a bound outside it, or None when the
+        deadline passed first, and the number of nodes searched.
+        """
+        if self.__currentState not in (None, condition.get_current_state()):
+            self.__table.clear()
+        self.__currentState = condition.get_current_state()
+        self.__opponentState = condition.get_opponent_state()
+        """ Positions never repeat within a game, so a new root is a
+        new think() of the parent: age the table as think() does.
+        """
+        if condition.get_hash() != self.__root_hash:
+            self.__root_hash = condition.get_hash()
+            self.__table.new_search()
+        self.__max_depth = max_depth
+        self.__deadline = deadline
+        self.__killers = []
+        self.__stats = SearchStats()
+
+        condition.move(row, col, safety_check=False)
+        try:
+            (_, _, score) = self.alphabeta(condition, 1, alpha, beta)
+        except SearchTimeout:
+            score = None
+        finally:
+            condition.undo_move()
+            self.__deadline = None
+
+        return (score, self.__stats.nodes)
+
+
+""" The searcher of a worker process, kept between tasks so that its
+transposition table is reused.
+"""
+worker_ai = None
+
+
+def search_root_move(task):
+    """ Pool task of ReversiAI's parallel root search.
+
+    Input:
+        task: Tuple object (condition, row, col, max_depth, deadline,
+    algorithm, alpha, beta).
+    Output:
+        Tuple object (score, nodes), see ReversiAI.score_move().
+    """
+    global worker_ai
+    (condition, row, col, max_depth, deadline, algorithm, alpha,
+     beta) = task
+    if worker_ai is None:
+        worker_ai = ReversiAI(condition, max_depth, workers=1,
+                              verbose=False, algorithm=algorithm)
+    worker_ai.algorithm = algorithm
+    return worker_ai.score_move(condition, row, col, max_depth, deadline,
+                                alpha, beta)
@@ -0,0 +1,274 @@
+""" selfplay.py
+
+Headless batch runner that plays ReversiAI against ReversiAI, without
+pygame or a display.
+
+Execution:
+    ```bash
+    $ python selfplay.py --games 100 --black-depth 2 --white-depth 3 \
+          --opening 4 --processes 8 --output games.jsonl
+    $ python selfplay.py --games 100000 --output /dev/null \
+          --record games.rvg
+    ```
+
+    Every finished game is written as one JSON line, and with --record
+    also appended to a compact game_record.py file. The aggregate
+    throughput is printed to stderr at the end.
+
+The same runner is available from Python through run_batch().
+"""
+
+import argparse
+import json
+import sys
+from multiprocessing import Pool, cpu_count
+from random import Random
+from time import time
+
+from const import *
+from core import Reversi
+from bitboard import BitboardReversi
+from reversi_AI_search import ReversiAI
+from opening_book import open_book
+from game_record import GameRecordWriter, insert_passes, max_setting, \
+    no_time_limit
+
+
+def state_name(state):
+    """ Returns the lowercase color name of a BoardState object. """
+    return state.name.lower()
+
+
+def play_game(game_id, black_depth, white_depth, opening=0, seed=0,
+              time_limit=None, book_path=None):
+    """ Play one AI-vs-AI game.
+
+    Input:
+        game_id: Int object, the number of the game in its batch.
+        black_depth, white_depth: Int objects, the search depth of
+    each side.
+        opening: Int object, the number of random moves played before
+    the AIs take over.
+        seed: Int object, the seed of the random opening.
+        time_limit: Float object, the time budget of each AI move, None
+    for fixed-depth search.
+        book_path: String object, the opening book used by both AIs,
+    None to always search.
+    Output:
+        Dict object with the moves, the final counts, the winner and
+    the time of each AI move.
+    """
+    random = Random(seed)
+    if Use_Bitboard:
+        reversi = BitboardReversi()
+    else:
+        reversi = Reversi()
+
+    book = None
+    if book_path is not None:
+        book = open_book(book_path)
+    players = {
+        BoardState.Black: ReversiAI(reversi, black_depth, workers=1,
+                                    verbose=False, book=book),
+        BoardState.White: ReversiAI(reversi, white_depth, workers=1,
+                                    verbose=False, book=book)
+    }
+
+    moves = []
+    move_times = []
+    start = time()
+    (Finished, Winner) = reversi.check_winning_status()
+
+    while not Finished:
+        if len(moves) < opening:
+            (pos_row, pos_col, _) = random.choice(reversi.legal_moves())
+        else:
+            move_start = time()
+            (pos_row, pos_col) = players[
+                reversi.get_current_state()].think(time_limit=time_limit)
+            move_times.append(round(time() - move_start, 6))
+
+        reversi.move(pos_row, pos_col, safety_check=True)
+        moves.append([pos_row, pos_col])
+        (Finished, Winner) = reversi.check_winning_status()
+
+    if book is not None:
+        book.close()
+
+    (black_count, white_count) = reversi.get_chess_count()
+    return {
+        'game': game_id,
+        'seed': seed,
+        'black_depth': black_depth,
+        'white_depth': white_depth,
+        'opening': opening,
+        'moves': moves,
+        'black': black_count,
+        'white': white_count,
+        'winner': state_name(Winner),
+        'move_times': move_times,
+        'duration': round(time() - start, 6)
+    }
+
+
+def play_game_task(task):
+    """ Pool task wrapper of play_game(). """
+    return play_game(*task)
+
+
+def run_batch(games, black_depth=AI_Search_Depth,
+              white_depth=AI_Search_Depth, opening=0, seed=0,
+              processes=None, time_limit=None, book_path=None):
+    """ Play a batch of games across worker processes.
+
+    Input:
+        games: Int object, the number of games.
+        processes: Int object, the number of worker processes, all
+    cores by default. 1 plays the games in this process.
+        seed: Int object, game i uses seed + i for its opening.
+        The rest are the same as play_game().
+    Output:
+        Generator of the play_game() results, in completion order.
+    """
+    tasks = [(game_id, black_depth, white_depth, opening, seed + game_id,
+              time_limit, book_path) for game_id in range(games)]
+
+    if processes is None:
+        processes = cpu_count()
+    if processes <= 1:
+        for task in tasks:
+            yield play_game_task(task)
+        return
+
+    pool = Pool(processes)
+    try:
+        for result in pool.imap_unordered(play_game_task, tasks):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def new_totals():
+    """ Returns the empty running totals of a batch, see tally(). """
+    return {
+        'games': 0,
+        'black_wins': 0,
+        'white_wins': 0,
+        'draws': 0,
+        'moves': 0,
+        'searched_moves': 0,
+        'search_time': 0.0
+    }
+
+
+def tally(totals, result):
+    """ Add one play_game() result to the running totals of a batch,
+    so that the results need not be kept.
+    """
+    totals['games'] += 1
+    if result['winner'] == 'black':
+        totals['black_wins'] += 1
+    elif result['winner'] == 'white':
+        totals['white_wins'] += 1
+    else:
+        totals['draws'] += 1
+    totals['moves'] += len(result['moves'])
+    totals['searched_moves'] += len(result['move_times'])
+    totals['search_time'] += sum(result['move_times'])
+
+
+def summarize(totals, elapsed):
+    """ Aggregate the results of a batch.
+
+    Input:
+        totals: Dict object, the running totals filled by tally().
+        elapsed: Float object, the wall time of the batch in seconds.
+    Output:
+        Dict object with the win counts and the throughput.
+    """
+    summary = {
+        'games': totals['games'],
+        'black_wins': totals['black_wins'],
+        'white_wins': totals['white_wins'],
+        'draws': totals['draws'],
+        'elapsed': round(elapsed, 3),
+        'games_per_second': 0.0,
+        'moves_per_second': 0.0,
+        'mean_move_time': 0.0
+    }
+    if elapsed > 0:
+        summary['games_per_second'] = round(totals['games'] / elapsed, 3)
+        summary['moves_per_second'] = round(totals['moves'] / elapsed, 3)
+    if totals['searched_moves'] > 0:
+        summary['mean_move_time'] = round(
+            totals['search_time'] / totals['searched_moves'], 6)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Play ReversiAI against itself without a display.')
+    parser.add_argument('-n', '--games', type=int, default=10)
+    parser.add_argument('--black-depth', type=int, default=AI_Search_Depth)
+    parser.add_argument('--white-depth', type=int, default=AI_Search_Depth)
+    parser.add_argument('--opening', type=int, default=0,
+                        help='number of random moves before the AIs play')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='seconds per AI move, iterative deepening')
+    parser.add_argument('--book', default=None,
+                        help='opening book file used by both AIs')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='worker processes, all cores by default')
+    parser.add_argument('-o', '--output', default='-',
+                        help='JSON lines file, stdout by default')
+    parser.add_argument('--record', default=None,
+                        help='game record file the games are appended to')
+    args = parser.parse_args(argv)
+    if args.record is not None:
+        for (name, value) in (('--black-depth', args.black_depth),
+                              ('--white-depth', args.white_depth),
+                              ('--opening', args.opening)):
+            if not 0 <= value <= max_setting:
+                parser.error('%s must be from 0 to %d with --record'
+                             % (name, max_setting))
+        if args.time_limit is not None and \
+           not 0 <= round(args.time_limit * 1000) < no_time_limit:
+            parser.error('--time-limit out of range with --record')
+
+    recorder = None
+    if args.record is not None:
+        recorder = GameRecordWriter(args.record)
+    if args.output == '-':
+        output = sys.stdout
+    else:
+        output = open(args.output, 'w')
+
+    totals = new_totals()
+    start = time()
+    try:
+        for result in run_batch(args.games, args.black_depth,
+                                args.white_depth, args.opening, args.seed,
+                                args.processes, args.time_limit,
+                                args.book):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            if recorder is not None:
+                recorder.write(insert_passes(result['moves']),
+                               BoardState[result['winner'].capitalize()],
+                               result['black'], result['white'],
+                               result['black_depth'], result['white_depth'],
+                               result['opening'], args.time_limit)
+            tally(totals, result)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if recorder is not None:
+            recorder.close()
+
+    print(json.dumps(summarize(totals, time() - start)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+""" server.py
+
+Asyncio TCP server hosting many human-vs-AI games at once.
+
+Execution:
+    ```bash
+    $ python server.py --port 8765 --workers 4 --max-pending 64
+    ```
+
+Protocol:
+    One JSON object per line in each direction. Every request has a
+"cmd" and may carry an "id", which is echoed in its response.
+
+    {"cmd": "new", "color": "black", "depth": 3, "time_limit": null}
+        Start a game where the client plays `color`. All fields but
+    "cmd" are optional; depth and time_limit are capped by --max-depth
+    and --max-time-limit, and the response carries the values used.
+    When the AI moves first, its moves are made before the response.
+    {"cmd": "move", "session": 1, "row": 2, "col": 3}
+        Play a move, then let the AI answer until it is the client's
+    turn again or the game is over. When the AI fails to answer, the
+    move is taken back.
+    {"cmd": "state", "session": 1}
+    {"cmd": "close", "session": 1}
+
+    A response is {"ok": true, ...} with the game state, and the AI
+moves made as "ai_moves", or {"ok": false, "error": "..."}. Games
+belong to their connection and end with it.
+
+The AI searches run in a bounded process pool, so the event loop never
+blocks on them. When all workers are busy, further searches wait in
+line; once --max-pending searches are waiting, requests that need one
+are refused with the "busy" error, without any effect, and can be
+retried. Each connection is served one request at a time, so a client
+that floods the server is held back by TCP itself.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from const import *
+from core import Reversi
+from bitboard import BitboardReversi
+from reversi_AI_search import ReversiAI
+from opening_book import open_book
+
+piece_names = {
+    BoardState.Empty: '-',
+    BoardState.Black: 'X',
+    BoardState.White: 'O'
+}
+state_names = {
+    'black': BoardState.Black,
+    'white': BoardState.White
+}
+
+
+class ServerBusy(Exception):
+    """Raised when too many AI searches are waiting for a worker."""
+    pass
+
+
+""" The opening book of a worker process, opened by its first search.
+"""
+worker_book = None
+worker_book_opened = False
+
+
+def think_task(task):
+    """ Process pool task: choose the AI move of a position.
+
+    Input:
+        task: Tuple object (black bits, white bits, state value, depth,
+    time limit).
+    Output:
+        Tuple object (row, col).
+    """
+    global worker_book, worker_book_opened
+    (black, white, state_value, depth, time_limit) = task
+    if not worker_book_opened:
+        worker_book = open_book()
+        worker_book_opened = True
+
+    chessMap = [[BoardState.Empty for col in range(n)] for row in range(n)]
+    for square in range(n_squared):
+        if (black >> square) & 1:
+            chessMap[square // n][square % n] = BoardState.Black
+        elif (white >> square) & 1:
+            chessMap[square // n][square % n] = BoardState.White
+    reversi = BitboardReversi(chessMap, BoardState(state_value))
+
+    ai = ReversiAI(reversi, depth, workers=1, verbose=False,
+                   book=worker_book)
+    return ai.think(time_limit=time_limit)
+
+
+class Session(object):
+    """Session object holding one human-vs-AI game.
+
+    Attributes:
+        reversi: Reversi object. the board of the game.
+        human: BoardState object. the color of the client.
+        depth: int. the search depth of the AI.
+        time_limit: float. the time budget of each AI move, None for
+    fixed depth.
+    """
+    def __init__(self, human, depth, time_limit):
+        if Use_Bitboard:
+            self.reversi = BitboardReversi()
+        else:
+            self.reversi = Reversi()
+        self.human = human
+        self.depth = depth
+        self.time_limit = time_limit
+
+    def describe(self):
+        """ Get the game state sent to the client.
+
+        Output:
+            Dict object.
+        """
+        reversi = self.reversi
+        (Finished, Winner) = reversi.check_winning_status()
+        (black_count, white_count) = reversi.get_chess_count()
+        board = [''.join(piece_names[reversi.get_position_state(row, col)]
+                         for col in range(n)) for row in range(n)]
+        state = {
+            'board': board,
+            'turn': reversi.get_current_state().name.lower(),
+            'black': black_count,
+            'white': white_count,
+            'finished': Finished,
+            'winner': Winner.name.lower() if Finished else None,
+            'legal_moves': []
+        }
+        if not Finished and reversi.get_current_state() == self.human:
+            state['legal_moves'] = [[row, col] for (row, col, flipped)
+                                    in reversi.legal_moves()]
+        return state
+
+    def ai_to_move(self):
+        """ Whether the game goes on with the AI to move.
+
+        Output:
+            Bool object.
+        """
+        return not self.reversi.check_winning_status()[0] and \
+            self.reversi.get_current_state() != self.human
+
+
+class ReversiServer(object):
+    """ReversiServer object that serves games over line-delimited JSON.
+
+    Attributes:
+        workers: int. the number of AI worker processes.
+        max_pending: int. the number of AI searches allowed to wait for
+    a worker before requests are refused.
+        depth: int. the default search depth of new games.
+        time_limit: float. the default time budget of AI moves.
+        max_depth: int. the highest search depth a client may ask for.
+        max_time_limit: float. the highest time budget a client may ask
+    for.
+        __pool: ProcessPoolExecutor object. the AI worker processes.
+        __slots: Semaphore object. one slot per worker.
+        __pending: int. the number of searches waiting for a slot.
+        __ids: count object. the source of session ids.
+    """
+    def __init__(self, workers=AI_Workers, max_pending=64,
+                 depth=AI_Search_Depth, time_limit=AI_Time_Limit,
+                 max_depth=6, max_time_limit=5.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_depth = max_depth
+        self.max_time_limit = max_time_limit
+        self.depth = min(depth, max_depth)
+        self.time_limit = time_limit
+        if time_limit is not None:
+            self.time_limit = min(time_limit, max_time_limit)
+        self.__pool = ProcessPoolExecutor(max_workers=workers)
+        self.__slots = None
+        self.__pending = 0
+        self.__ids = itertools.count(1)
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """ Accept connections until cancelled. """
+        self.__slots = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.__pool.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        """ Serve the requests of one connection, one at a time. """
+        sessions = {}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self.respond(line, sessions)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line, sessions):
+        """ Answer one request line.
+
+        Input:
+            line: Bytes object, the JSON request.
+            sessions: Dict object, the games of the connection keyed by
+        session id.
+        Output:
+            Dict object, the response.
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+            request_id = request.get('id')
+            response = await self.dispatch(request, sessions)
+            response['ok'] = True
+        except ServerBusy:
+            response = {'ok': False, 'error': 'busy'}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    async def dispatch(self, request, sessions):
+        """ Run one command.
+
+        Output:
+            Dict object, the response without its status.
+        """
+        cmd = request.get('cmd')
+        if cmd == 'new':
+            human = state_names.get(request.get('color', 'black'))
+            if human is None:
+                raise ValueError('Color must be black or white')
+            depth = int(request.get('depth', self.depth))
+            if depth < 0:
+                raise ValueError('Depth must not be negative')
+            depth = min(depth, self.max_depth)
+            time_limit = request.get('time_limit', self.time_limit)
+            if time_limit is not None:
+                time_limit = float(time_limit)
+                if not time_limit >= 0:
+                    raise ValueError('Time limit must not be negative')
+                time_limit = min(time_limit, self.max_time_limit)
+
+            session = Session(human, depth, time_limit)
+            if session.ai_to_move():
+                self.check_capacity()
+            ai_moves = await self.play_ai(session)
+            session_id = next(self.__ids)
+            sessions[session_id] = session
+            response = {'session': session_id, 'depth': depth,
+                        'time_limit': time_limit, 'ai_moves': ai_moves}
+            response.update(session.describe())
+            return response
+
+        session_id = request.get('session')
+        if session_id not in sessions:
+            raise ValueError('Unknown session: ' + str(session_id))
+        session = sessions[session_id]
+
+        if cmd == 'move':
+            if not isinstance(request.get('row'), int) or \
+               not isinstance(request.get('col'), int):
+                raise ValueError('Position data must be int')
+            if session.ai_to_move() or \
+               session.reversi.check_winning_status()[0]:
+                raise ValueError('Not your turn')
+            self.check_capacity()
+            session.reversi.move(request['row'], request['col'],
+                                 safety_check=True)
+            ai_moves = []
+            try:
+                await self.play_ai(session, ai_moves)
+            except BaseException:
+                """ Leave the game as it was before the request, so the
+                client can play again instead of waiting on an AI turn
+                that nothing would resume.
+                """
+                for played in range(len(ai_moves) + 1):
+                    session.reversi.undo_move()
+                raise
+            response = {'session': session_id, 'ai_moves': ai_moves}
+            response.update(session.describe())
+            return response
+        elif cmd == 'state':
+            response = {'session': session_id}
+            response.update(session.describe())
+            return response
+        elif cmd == 'close':
+            del sessions[session_id]
+            return {'session': session_id}
+        raise ValueError('Unknown command: ' + str(cmd))
+
+    async def play_ai(self, session, moves=None):
+        """ Make the AI moves of a session until the client is to move
+        or the game is over.
+
+        Input:
+            moves: List object the moves are appended to as they are
+        made, a new one by default.
+        Output:
+            List object of [row, col] moves.
+        """
+        if moves is None:
+            moves = []
+        while session.ai_to_move():
+            (black, white) = session.reversi.get_bitboards()
+            task = (black, white, session.reversi.get_current_state().value,
+                    session.depth, session.time_limit)
+            (row, col) = await self.think(task)
+            session.reversi.move(row, col, safety_check=True)
+            moves.append([row, col])
+        return moves
+
+    def check_capacity(self):
+        """ Raise ServerBusy when all workers are busy and max_pending
+        searches are already waiting. Called before a request changes
+        anything, so a refused request has no effect.
+        """
+        if self.__slots.locked() and self.__pending >= self.max_pending:
+            raise ServerBusy()
+
+    async def think(self, task):
+        """ Run think_task() in the pool once a worker is free. """
+        self.__pending += 1
+        try:
+            await self.__slots.acquire()
+        finally:
+            self.__pending -= 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__pool, think_task, task)
+        finally:
+            self.__slots.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve human-vs-AI Reversi games over TCP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('-w', '--workers', type=int, default=AI_Workers,
+                        help='AI worker processes')
+    parser.add_argument('--max-pending', type=int, default=64,
+                        help='AI searches waiting before refusing more')
+    parser.add_argument('--depth', type=int, default=AI_Search_Depth)
+    parser.add_argument('--time-limit', type=float, default=AI_Time_Limit)
+    parser.add_argument('--max-depth', type=int, default=6,
+                        help='highest search depth a client may ask for')
+    parser.add_argument('--max-time-limit', type=float, default=5.0,
+                        help='highest seconds per AI move a client may ask')
+    args = parser.parse_args(argv)
+
+    server = ReversiServer(args.workers, args.max_pending, args.depth,
+                           args.time_limit, args.max_depth,
+                           args.max_time_limit)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+""" test_engines.py
+
+Regression checks of the board engines: core.Reversi and
+bitboard.BitboardReversi against a plain reference implementation of
+the rules, and the incremental state kept by move() and undo_move().
+
+Execution:
+    ```bash
+    $ python -m unittest test_engines test_search
+    ```
+"""
+
+import unittest
+from random import Random
+
+from const import *
+from core import Reversi, pos_shift, transform_move
+from bitboard import BitboardReversi
+
+engines = (Reversi, BitboardReversi)
+
+
+def reference_flips(board, row, col, state):
+    """ The pieces a move flips, walking the 8 directions of a 2-D
+    list board the slow way.
+
+    Output:
+        Set object of (row, col) positions.
+    """
+    if board[row][col] != BoardState.Empty:
+        return set()
+    oppo = BoardState.White if state == BoardState.Black \
+        else BoardState.Black
+    flipped = set()
+    for (d_row, d_col) in pos_shift:
+        line = []
+        (r, c) = (row + d_row, col + d_col)
+        while 0 <= r < n and 0 <= c < n and board[r][c] == oppo:
+            line.append((r, c))
+            (r, c) = (r + d_row, c + d_col)
+        if line and 0 <= r < n and 0 <= c < n and board[r][c] == state:
+            flipped.update(line)
+    return flipped
+
+
+def reference_moves(board, state):
+    """ The legal moves of state, as {(row, col): flipped set}. """
+    moves = {}
+    for row in range(n):
+        for col in range(n):
+            flipped = reference_flips(board, row, col, state)
+            if flipped:
+                moves[(row, col)] = flipped
+    return moves
+
+
+def flipped_positions(flipped_bits):
+    """ The set of (row, col) positions set in flipped bits. """
+    return {(square // n, square % n) for square in range(n_squared)
+            if (flipped_bits >> square) & 1}
+
+
+def snapshot(reversi):
+    """ Everything move() and undo_move() must keep in step. """
+    return (reversi.get_bitboards(), reversi.get_current_state(),
+            reversi.get_chess_count(), reversi.get_weight_score(),
+            reversi.get_hash(), reversi.get_canonical_hash(),
+            [(row, col) for (row, col, flipped) in reversi.legal_moves()])
+
+
+def random_games(count, seed):
+    """ Generate the move lists of random games to the end. """
+    random = Random(seed)
+    for game in range(count):
+        reversi = BitboardReversi()
+        moves = []
+        while not reversi.check_winning_status()[0]:
+            (row, col, flipped) = random.choice(reversi.legal_moves())
+            reversi.move(row, col)
+            moves.append((row, col))
+        yield moves
+
+
+class EngineTest(unittest.TestCase):
+
+    def test_rules_match_reference(self):
+        """ Both engines agree with the reference rules on every
+        position of random games, passes and results included.
+        """
+        for moves in random_games(100, 1):
+            board = [[BoardState.Empty] * n for row in range(n)]
+            board[3][3] = board[4][4] = BoardState.White
+            board[3][4] = board[4][3] = BoardState.Black
+            state = BoardState.Black
+            boards = [engine() for engine in engines]
+
+            for (row, col) in moves:
+                expected = reference_moves(board, state)
+                for reversi in boards:
+                    self.assertEqual(reversi.get_current_state(), state)
+                    legal = {(r, c): flipped_positions(flipped)
+                             for (r, c, flipped) in reversi.legal_moves()}
+                    self.assertEqual(legal, expected)
+
+                for (r, c) in expected[(row, col)] | {(row, col)}:
+                    board[r][c] = state
+                for reversi in boards:
+                    reversi.move(row, col)
+                    self.assertEqual(reversi.get_chessMap(), board)
+
+                oppo = BoardState.White if state == BoardState.Black \
+                    else BoardState.Black
+                if reference_moves(board, oppo):
+                    state = oppo
+
+            black = sum(row.count(BoardState.Black) for row in board)
+            white = sum(row.count(BoardState.White) for row in board)
+            if black > white:
+                winner = BoardState.Black
+            elif white > black:
+                winner = BoardState.White
+            else:
+                winner = BoardState.Empty
+            for reversi in boards:
+                self.assertEqual(reversi.check_winning_status(),
+                                 (True, winner))
+                self.assertEqual(reversi.get_chess_count(), (black, white))
+
+    def test_weight_score(self):
+        """ The incremental weight score is the weighted piece sum. """
+        for moves in random_games(10, 2):
+            for engine in engines:
+                reversi = engine()
+                for (row, col) in moves:
+                    reversi.move(row, col)
+                    expected = 0
+                    for r in range(n):
+                        for c in range(n):
+                            state = reversi.get_position_state(r, c)
+                            if state == BoardState.Black:
+                                expected += weight_matrix[r][c]
+                            elif state == BoardState.White:
+                                expected -= weight_matrix[r][c]
+                    self.assertEqual(reversi.get_weight_score(), expected)
+
+    def test_undo_round_trip(self):
+        """ undo_move() restores the board, counts, weight, hashes and
+        legal moves, and returns the record move() returned.
+        """
+        for moves in random_games(20, 3):
+            for engine in engines:
+                reversi = engine()
+                history = []
+                for (row, col) in moves:
+                    before = snapshot(reversi)
+                    record = reversi.move(row, col)
+                    self.assertEqual(record[:2], (row, col))
+                    history.append((before, record))
+                for (before, record) in reversed(history):
+                    self.assertEqual(reversi.undo_move(), record)
+                    self.assertEqual(snapshot(reversi), before)
+                self.assertRaises(Exception, reversi.undo_move)
+
+    def test_engines_share_records_and_hashes(self):
+        """ The two engines return the same records and hashes. """
+        for moves in random_games(200, 4):
+            boards = [engine() for engine in engines]
+            for (row, col) in moves:
+                records = [reversi.move(row, col) for reversi in boards]
+                self.assertEqual(records[0], records[1])
+                self.assertEqual(snapshot(boards[0]), snapshot(boards[1]))
+
+    def test_copy_is_independent(self):
+        for engine in engines:
+            reversi = engine()
+            reversi.move(2, 3)
+            other = reversi.copy()
+            self.assertEqual(snapshot(other), snapshot(reversi))
+            other.move(*other.legal_moves()[0][:2])
+            self.assertNotEqual(snapshot(other), snapshot(reversi))
+            other.undo_move()
+            self.assertEqual(snapshot(other), snapshot(reversi))
+            self.assertRaises(Exception, other.undo_move)
+
+    def test_canonical_hash_is_symmetric(self):
+        """ The 8 symmetric images of a position share their canonical
+        hash and canonical form.
+        """
+        for moves in random_games(5, 5):
+            for ply in (4, 12, 30):
+                reversi = BitboardReversi()
+                for (row, col) in moves[:ply]:
+                    reversi.move(row, col)
+                chessMap = reversi.get_chessMap()
+                state = reversi.get_current_state()
+                for engine in engines:
+                    images = set()
+                    for sym in range(8):
+                        image = [[None] * n for row in range(n)]
+                        for row in range(n):
+                            for col in range(n):
+                                (r, c) = transform_move((row, col), sym)
+                                image[r][c] = chessMap[row][col]
+                        other = engine(image, state)
+                        images.add((other.get_canonical_hash()[0],
+                                    other.get_canonical()[:2]))
+                    self.assertEqual(len(images), 1)
+
+    def test_illegal_moves_raise(self):
+        for engine in engines:
+            reversi = engine()
+            self.assertRaises(Exception, reversi.move, 0, 0)
+            self.assertRaises(Exception, reversi.move, 3, 3)
+            self.assertRaises(ValueError, reversi.move, 2.0, 3)
+            self.assertEqual(reversi.get_chess_count(), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+""" test_search.py
+
+Regression checks of the AI: the scores of ReversiAI against a plain
+minimax, and EndgameSolver against a brute force search of the
+reference rules of test_engines.py.
+
+Execution:
+    ```bash
+    $ python -m unittest test_engines test_search
+    ```
+"""
+
+import unittest
+from random import Random
+
+from const import *
+from bitboard import BitboardReversi
+from reversi_AI_search import ReversiAI, EndgameSolver
+from test_engines import random_games, reference_flips
+
+
+def positions(count, seed, empties=None):
+    """ Generate positions of random games, with the given number of
+    empty squares or anywhere before the end.
+
+    Output:
+        BitboardReversi objects, not finished.
+    """
+    random = Random(seed)
+    for moves in random_games(count * 4, seed):
+        if empties is None:
+            plies = random.randrange(len(moves))
+        else:
+            plies = n_squared - 4 - empties
+        reversi = BitboardReversi()
+        for (row, col) in moves[:plies]:
+            reversi.move(row, col)
+        if reversi.check_winning_status()[0] or \
+           n_squared - reversi.get_tot_chess_count() != \
+           (n_squared - 4 - plies if empties is None else empties):
+            continue
+        yield reversi
+        count -= 1
+        if count == 0:
+            return
+
+
+def minimax(ai, condition, ply, max_depth, state):
+    """ The score ReversiAI gives a position, without any pruning,
+    table or ordering.
+
+    Input:
+        ai: ReversiAI object, for its evaluate().
+        ply: Int object, the depth of the position from the root.
+        state: BoardState object, the color of the AI.
+    """
+    if ply > max_depth:
+        return ai.evaluate(condition)
+    moves = condition.legal_moves()
+    if not moves:
+        winner = condition.check_winning_status()[1]
+        if winner == state:
+            return winning
+        if winner == BoardState.Empty:
+            return 0
+        return -winning
+
+    scores = []
+    for (row, col, flipped) in moves:
+        condition.move(row, col)
+        scores.append(minimax(ai, condition, ply + 1, max_depth, state))
+        condition.undo_move()
+    if condition.get_current_state() == state:
+        return max(scores)
+    return min(scores)
+
+
+def brute_force(board, state):
+    """ The final disc differential for state, to move on a 2-D list
+    board, under perfect play.
+    """
+    oppo = BoardState.White if state == BoardState.Black \
+        else BoardState.Black
+    empties = [(row, col) for row in range(n) for col in range(n)
+               if board[row][col] == BoardState.Empty]
+    best = None
+    for (row, col) in empties:
+        flipped = reference_flips(board, row, col, state)
+        if not flipped:
+            continue
+        child = [line[:] for line in board]
+        for (r, c) in flipped | {(row, col)}:
+            child[r][c] = state
+        score = -brute_force(child, oppo)
+        if best is None or score > best:
+            best = score
+    if best is not None:
+        return best
+
+    if any(reference_flips(board, row, col, oppo)
+           for (row, col) in empties):
+        return -brute_force(board, oppo)
+    own_count = sum(line.count(state) for line in board)
+    oppo_count = sum(line.count(oppo) for line in board)
+    return own_count - oppo_count
+
+
+def bits(board, state):
+    """ The bitboard of the pieces of state on a 2-D list board. """
+    return sum(1 << (row * n + col) for row in range(n) for col in range(n)
+               if board[row][col] == state)
+
+
+class SearchTest(unittest.TestCase):
+
+    def check_scores(self, algorithm, depths, workers=1, count=6):
+        """ The score of think() at each depth equals the minimax
+        score of the position.
+        """
+        for reversi in positions(count, 10 + len(algorithm)):
+            state = reversi.get_current_state()
+            for depth in depths:
+                ai = ReversiAI(reversi, depth, workers=workers,
+                               verbose=False, endgame_empties=0,
+                               algorithm=algorithm)
+                try:
+                    (row, col) = ai.think()
+                finally:
+                    ai.close()
+                expected = minimax(ai, reversi.copy(), 0, depth, state)
+                self.assertEqual(ai.get_last_score(), expected)
+
+                """ The chosen move must reach the score. """
+                condition = reversi.copy()
+                condition.move(row, col, safety_check=True)
+                self.assertEqual(
+                    minimax(ai, condition, 1, depth, state), expected)
+
+    def test_alphabeta_matches_minimax(self):
+        self.check_scores('alphabeta', range(4))
+
+    def test_pvs_matches_minimax(self):
+        self.check_scores('pvs', range(4))
+
+    def test_parallel_matches_minimax(self):
+        self.check_scores('alphabeta', [ReversiAI.parallel_depth],
+                          workers=2, count=2)
+        self.check_scores('pvs', [ReversiAI.parallel_depth],
+                          workers=2, count=2)
+
+    def test_endgame_solver_matches_brute_force(self):
+        """ The solver scores both sides of positions 7 empties from
+        the end exactly, passes included, and its move reaches the
+        score.
+        """
+        for reversi in positions(8, 20, empties=7):
+            board = reversi.get_chessMap()
+            for state in (BoardState.Black, BoardState.White):
+                oppo = BoardState.White if state == BoardState.Black \
+                    else BoardState.Black
+                expected = brute_force(board, state)
+                solver = EndgameSolver()
+                (row, col, score) = solver.solve(bits(board, state),
+                                                 bits(board, oppo))
+                self.assertEqual(score, expected)
+                if row is None:
+                    continue
+                child = [line[:] for line in board]
+                for (r, c) in reference_flips(board, row, col, state) | \
+                        {(row, col)}:
+                    child[r][c] = state
+                self.assertEqual(-brute_force(child, oppo), expected)
+
+    def test_endgame_score(self):
+        """ think() reports a solved position as winning plus the disc
+        differential, or 0 for a draw.
+        """
+        for reversi in positions(3, 30, empties=7):
+            expected = brute_force(reversi.get_chessMap(),
+                                   reversi.get_current_state())
+            ai = ReversiAI(reversi, 1, workers=1, verbose=False,
+                           endgame_empties=7)
+            ai.think()
+            if expected > 0:
+                expected += winning
+            elif expected < 0:
+                expected -= winning
+            self.assertEqual(ai.get_last_score(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()